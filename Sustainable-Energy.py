@@ -1,15 +1,189 @@
+import json
+import os
+import time
+import uuid
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# Loading the data
-Energy_data = pd.read_csv("Energy_data.csv")
+import energy_charts
+import energy_data
+import energy_figures
+import energy_imports
+import energy_precompute
+import energy_profiling
+import energy_projections
+import energy_quality
+import energy_refresh
+import energy_serving
+import energy_tables
+import energy_views
+from energy_profiling import timed_view
+
+# Imported by the first view that draws with them, not on every cold start
+px = energy_imports.lazy_import("plotly.express")
+sns = energy_imports.lazy_import("seaborn")
+
+
+# Missing values filled and outliers flagged by the quality stage
+def quality_report(dataset):
+    def build():
+        zscores = [energy_quality.zscore_column(c) for c in energy_quality.OUTLIER_METRICS]
+        checked = energy_quality.read_quality_data(dataset.path, [*energy_data.SCHEMA, *zscores], dataset.version)
+        raw = energy_data.read_energy_data(dataset.path, version=dataset.version)
+        return energy_quality.quality_summary(raw, checked), energy_quality.flagged_rows(checked)
+    return dataset.memo("quality report", build)
+
+
+# Year index and rankings over only the columns a tab needs
+def projected_tables(dataset, columns):
+    columns = tuple(columns)
+    return dataset.memo(("tables", columns), lambda: energy_tables.EnergyTables(
+        energy_quality.read_quality_data(dataset.path, columns, dataset.version)))
+
+
+# Pages, sort orders and summary statistics of the whole dataset
+def table_server(dataset):
+    return dataset.memo("table server", lambda: energy_serving.TableServer(dataset.data))
+
+
+# Per-entity trend fits of the projected metrics, fitted once per version
+def projection_engine(dataset):
+    return dataset.memo("projections", lambda: energy_projections.ProjectionEngine(dataset.tables))
+
+
+# Built on the refresher thread for each new version, so the first rerun
+# after a refresh finds them ready
+def warm_dataset(dataset):
+    projected_tables(dataset, energy_views.ACCESS_COLUMNS)
+    quality_report(dataset)
+    table_server(dataset).summary()
+    for metric in energy_projections.MODELS:
+        projection_engine(dataset).fit(metric)
+    energy_views.access_correlations(dataset.correlations)
+    energy_views.geo_correlations(dataset.correlations)
+
+
+# One refresher per process: it loads the data once per dataset version,
+# shared by all sessions and reruns, and swaps in new versions in the
+# background. ENERGY_SOURCE_DIR makes it serve the newest CSV of a directory.
+@st.cache_resource(show_spinner=False)
+def load_refresher():
+    return energy_refresh.DatasetRefresher(energy_data.DATA_PATH, source_dir=os.environ.get("ENERGY_SOURCE_DIR"),
+                                           warm=warm_dataset).start()
+
+
+def view_table(name, *key, tables=None):
+    """Return the precomputed view table `name` for `key`, computed from `tables` without artifacts."""
+    return energy_precompute.lookup(dataset.artifacts, Energy_tables if tables is None else tables, name, *key)
+
+
+# One figure cache per process, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def load_figure_cache():
+    return energy_figures.FigureCache(max_entries=256, max_bytes=64 * 2**20)
+
+
+def cached_figure(view, params, build):
+    """Return the figure of `view` for `params`, building it on a cache miss."""
+    profile = energy_profiling.current_profile()
+    if profile is None:
+        return load_figure_cache().get_or_build((view, params, data_version), build)
+    with profile.span(f"figure {view}"):
+        figure = load_figure_cache().get_or_build((view, params, data_version), build)
+    # Serializing the figure is what the browser gets sent: time it and keep its size
+    with profile.span(f"serialize {view}"):
+        profile.record_payload(view, energy_figures.figure_size(figure))
+    return figure
+
+
+def profiling_panel(record):
+    """Show this rerun's spans and payloads in the sidebar, with the session's JSON lines export."""
+    records = st.session_state.setdefault("profile_records", [])
+    records.append(record)
+    del records[:-200]
+    with st.sidebar.expander("Profiling", expanded=False):
+        peak = ("peak not measured, other sessions were profiled at the same time" if record["overlapped"]
+                else f"peak {record['peak_kb'] / 1024:.1f} MB traced")
+        st.write(f"**{record['page']}**: {record['total_ms']:.0f} ms, {peak}, "
+                 f"{record['payload_bytes'] / 1024:.0f} KB of figures")
+        st.dataframe(pd.DataFrame(record["spans"], columns=["name", "ms", "peak_kb"]), hide_index=True)
+        if record["payloads"]:
+            st.dataframe(pd.DataFrame(record["payloads"]), hide_index=True)
+        cache_stats = load_figure_cache().stats()
+        st.write(f"Figure cache: {cache_stats['entries']} entries, "
+                 f"{cache_stats['bytes'] / 2**20:.1f} MB, hit rate {cache_stats['hit_rate']:.0%}")
+        st.download_button("Export JSON lines", "".join(json.dumps(r) + "\n" for r in records),
+                           file_name="energy_profile.jsonl", mime="application/json")
+
+
+def map_points_controls(view):
+    """Widgets choosing between the top 10 and all entities on a map, and the zoomed extent.
+
+    With all entities the map is binned to energy_charts.GEO_POINT_BUDGET
+    markers; narrowing the ranges re-bins the points inside them more finely.
+    """
+    all_points = st.radio("Points", ["Top 10", "All entities"], index=0, horizontal=True,
+                          key=f"{view}-points") == "All entities"
+    if not all_points:
+        return False, energy_charts.WORLD
+    lat_range = st.slider("Latitude range", -90, 90, (-90, 90), key=f"{view}-lat")
+    lon_range = st.slider("Longitude range", -180, 180, (-180, 180), key=f"{view}-lon")
+    return True, (lat_range, lon_range)
+
+
+def paged_table(key, server, columns=None, page_size=energy_serving.PAGE_SIZE):
+    """Show one page of `server` with column, sort and page controls; return the chosen columns.
+
+    Sorting and slicing happen on the server, so only the visible rows and
+    columns are sent to the browser.
+    """
+    with st.expander("Columns, sorting and pages"):
+        columns = st.multiselect("Columns", server.columns, default=columns or server.columns,
+                                 key=f"{key}-columns") or server.columns
+        sort_column, order_column, size_column = st.columns(3)
+        sort_by = sort_column.selectbox("Sort by", [None, *columns], key=f"{key}-sort",
+                                        format_func=lambda c: "File order" if c is None else c)
+        ascending = not order_column.checkbox("Descending", key=f"{key}-descending")
+        page_size = size_column.selectbox("Rows per page", sorted({page_size, 10, 25, 100}), key=f"{key}-size",
+                                          index=sorted({page_size, 10, 25, 100}).index(page_size))
+        pages = server.pages(page_size)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}-page")
+    page = min(page, pages) - 1
+    st.dataframe(server.page(page, page_size, sort_by, ascending, columns))
+    if pages > 1:
+        st.caption(f"Rows {page * page_size + 1}-{min((page + 1) * page_size, len(server))} of {len(server)}")
+    return columns
+
+
+# Profiling is off unless ENERGY_PROFILE=1 or the page is opened with ?profile=1
+session_id = st.session_state.setdefault("profile_session", uuid.uuid4().hex)
+energy_profiling.start_rerun(session_id, energy_profiling.profiling_enabled(st.query_params.get("profile")))
+
+with timed_view("load data"):
+    # One Dataset for the whole rerun: a refresh swapping in a new version
+    # meanwhile only shows up on the next rerun
+    refresher = load_refresher()
+    dataset = refresher.current()
+    data_version = dataset.version
+    Energy_data = dataset.data
+    Energy_tables = dataset.tables
+    Energy_correlations = dataset.correlations
+
+st.sidebar.caption(f"Data version {data_version} ({os.path.basename(dataset.path)}), "
+                   f"loaded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(dataset.loaded))}")
+if refresher.loading:
+    st.sidebar.caption(f"Loading version {refresher.loading} in the background")
+if refresher.last_error:
+    st.sidebar.warning(f"Latest data not loaded: {refresher.last_error}")
+if st.sidebar.button("Refresh data"):
+    refresher.refresh()
 #TiTle
 st.title("☀️Sustainable-Energy☀️")
 # Use a radio button 
 menu = st.radio("Navigation", ["Project Objectives and Methodology", "Overview", "Features", "Analysis", "Conclusion"], index=0, horizontal=True)
+# `menu` is reused by the Electricity Access sub-views below
+page = menu
 
 # Home Page
 if menu == "Project Objectives and Methodology":
@@ -66,10 +240,20 @@ if menu == "Project Objectives and Methodology":
 # Overview
 elif menu == "Overview":
     st.header("Dataset Overview")
-    st.dataframe(Energy_data.head(10))
+    overview = table_server(dataset)
+    overview_columns = paged_table("overview", overview)
     st.write(f"**Shape of the dataset:** {Energy_data.shape[0]} rows, {Energy_data.shape[1]} columns")
     st.write("### Summary Statistics")
-    st.write(Energy_data.describe())
+    # Computed once per dataset version; approximate quantiles past energy_serving.EXACT_SUMMARY_ROWS
+    st.write(overview.summary(overview_columns))
+    st.write("### Data Quality")
+    quality_summary, quality_outliers = quality_report(dataset)
+    st.write(f"**Missing values filled:** {int(quality_summary['filled'].sum())} "
+             f"(derived formulas, then interpolation within each entity); "
+             f"**still missing:** {int(quality_summary['missing after fills'].sum())}")
+    st.dataframe(quality_summary)
+    st.write(f"**Outliers** (|robust z| > {energy_quality.OUTLIER_THRESHOLD} within the year): {len(quality_outliers)}")
+    st.dataframe(quality_outliers, hide_index=True)
 
 # Features description  
 elif menu == "Features":
@@ -179,273 +363,358 @@ elif menu == "Features":
 # Analysis
 elif menu == "Analysis":
     st.title("Analysis")
+    selected_year = st.selectbox("Year", Energy_tables.years, index=len(Energy_tables.years) - 1)
     st.subheader("📈Category")
-    tab1, tab2, tab3, tab4,tab5 = st.tabs(["GDP Analysis (2020)",
-                                      "Electricity Access",
-                                      "Regional Insights",
-                                      "Low CO2 Emitters",
-                                           "Entities have reduced CO2 emissions over time"])
-
-
-
- #################GDP Analysis (2020)######################
-    with tab1:
-        Tab1,Tab2,Tab3,Tab4=st.tabs(["countries with Highst GDP in the year 2020",
-                          "countries with Lowest GDP in the year 2020",
-                                     "Lowest 3 Countries performance since 2000",
-                                     "Highest 3 Countries performance since 2000"])
-        with Tab1:
-            #Show 10 countries with higher GDP in the year 2020
-            higher_gdp_countries_in_2020 = Energy_data[Energy_data['Year'] == 2020].sort_values(by='gdp_per_capita',
-                                                                                    ascending = False)[['Year','Entity',
-                                                                                                        'gdp_per_capita']][0:10]
-            
+    # Radios instead of st.tabs: st.tabs runs every tab body on each rerun,
+    # here only the selected category and sub-view are computed
+    category = st.radio("Category", ["GDP Analysis",
+                                     "Electricity Access",
+                                     "Regional Insights",
+                                     "Low CO2 Emitters",
+                                     "Entities have reduced CO2 emissions over time"],
+                        index=0, horizontal=True, label_visibility="collapsed",
+                        format_func=lambda c: f"{c} ({selected_year})" if c == "GDP Analysis" else c)
+
+
+
+ #################GDP Analysis (selected year)######################
+    if category == "GDP Analysis":
+        gdp_view = st.radio("GDP view", ["countries with Highst GDP in the year",
+                                         "countries with Lowest GDP in the year",
+                                         "Lowest 3 Countries performance since 2000",
+                                         "Highest 3 Countries performance since 2000"],
+                            index=0, horizontal=True, label_visibility="collapsed",
+                            format_func=lambda v: f"{v} {selected_year}" if v.endswith("the year") else v)
+        if gdp_view == "countries with Highst GDP in the year":
+            with timed_view("countries with Highst GDP in the year"):
+                #Show 10 countries with higher GDP in the selected year
+                higher_gdp_countries = view_table("gdp_highest", selected_year)
             
-            plt.figure(figsize=(14, 5))
-            sns.barplot(x='Entity', y='gdp_per_capita', data=higher_gdp_countries_in_2020)
-            plt.xlabel("Country name")
-            plt.ylabel("GDP per Capita ($)")
-            plt.title("Ten countries with highest GDP in the year 2020")
-            st.pyplot(plt)
+                if energy_charts.chart_backend() == "seaborn":
+                    def draw_highest_gdp(fig):
+                        ax = fig.subplots()
+                        sns.barplot(x='Entity', y='gdp_per_capita', data=higher_gdp_countries,
+                                    order=higher_gdp_countries['Entity'], ax=ax)
+                        ax.set_xlabel("Country name")
+                        ax.set_ylabel("GDP per Capita ($)")
+                        ax.set_title(f"Ten countries with highest GDP in the year {selected_year}")
+                    Highest = cached_figure("gdp-highest", selected_year,
+                                            lambda: energy_figures.render_png(draw_highest_gdp, figsize=(14, 5)))
+                    st.image(Highest, use_container_width=True)
+                else:
+                    Highest = cached_figure("gdp-highest-plotly", selected_year, lambda: px.bar(
+                        higher_gdp_countries,
+                        x='Entity',
+                        y='gdp_per_capita',
+                        category_orders={'Entity': higher_gdp_countries['Entity'].tolist()},
+                        labels={'Entity': 'Country name', 'gdp_per_capita': 'GDP per Capita ($)'},
+                        title=f"Ten countries with highest GDP in the year {selected_year}", height=500))
+                    st.plotly_chart(Highest, use_container_width=True)
             
 
-        with Tab2:
-            #Show 10 countries with lowest GDP in the year 2020
-            lowest_gdp_countries_in_2020 = Energy_data[Energy_data['Year'] == 2020].sort_values(by='gdp_per_capita', ascending = True)[['Year', 'Entity', 'gdp_per_capita']][0:10]
-            Lowest= px.bar(lowest_gdp_countries_in_2020,
-                           x='gdp_per_capita',
-                           y='Entity',
-                           title='Ten Countries with the Lowest GDP in the Year 2020', height= 500, width=600,
-                           labels={'gdp_per_capita': 'GDP per Capita ($)', 'Entity': 'Country Name'})
-            st.plotly_chart(Lowest, use_container_width=True)
-
-        with Tab3:
-            lowest_gdp_countries=lowest_gdp_countries_in_2020["Entity"].unique()# Creating list for the lowest Coungtry for plotting
-            lowest_gdp_countries_list = lowest_gdp_countries.tolist()
-            Country_lowest_gdp = Energy_data[Energy_data['Entity'].isin(lowest_gdp_countries_list[0:3])][['Year', 'Entity', 'gdp_per_capita']]
-            fig=px.line(Country_lowest_gdp,
-                    x='Year',
-                    y='gdp_per_capita',
-                    color='Entity',
-                    title='lowest 3 GDP per Capita Over Time',
-                    labels={'Year': 'Year', 'gdp_per_capita': 'lowest 3 GDP per Capita ($)'})
-            st.plotly_chart(fig, use_container_width=True)
-        with Tab4:
-            highest_gdp_countries=higher_gdp_countries_in_2020["Entity"].unique().tolist()
-            Country_highest_gdp = Energy_data[Energy_data['Entity'].isin(highest_gdp_countries[0:3])][['Year', 'Entity', 'gdp_per_capita']]
-            fig=px.line(
-                    Country_highest_gdp, 
-                    x='Year',
-                    y='gdp_per_capita',
-                    color='Entity', 
-                    title='Highest 3 GDP per Capita Over Time', 
-                    labels={'Year': 'Year', 'gdp_per_capita': 'Highest 3 GDP per Capita ($)'})
-            st.plotly_chart(fig, use_container_width=True)
+        if gdp_view == "countries with Lowest GDP in the year":
+            with timed_view("countries with Lowest GDP in the year"):
+                #Show 10 countries with lowest GDP in the selected year
+                lowest_gdp_countries = view_table("gdp_lowest", selected_year)
+                Lowest= cached_figure("gdp-lowest", selected_year, lambda: px.bar(lowest_gdp_countries,
+                               x='gdp_per_capita',
+                               y='Entity',
+                               title=f'Ten Countries with the Lowest GDP in the Year {selected_year}', height= 500, width=600,
+                               labels={'gdp_per_capita': 'GDP per Capita ($)', 'Entity': 'Country Name'}))
+                st.plotly_chart(Lowest, use_container_width=True)
+
+        if gdp_view == "Lowest 3 Countries performance since 2000":
+            with timed_view("Lowest 3 Countries performance since 2000"):
+                Country_lowest_gdp = energy_views.gdp_history(Energy_tables, selected_year, highest=False)
+                fig=cached_figure("gdp-lowest-3", selected_year, lambda: px.line(Country_lowest_gdp,
+                        x='Year',
+                        y='gdp_per_capita',
+                        color='Entity',
+                        title='lowest 3 GDP per Capita Over Time',
+                        labels={'Year': 'Year', 'gdp_per_capita': 'lowest 3 GDP per Capita ($)'}))
+                st.plotly_chart(fig, use_container_width=True)
+        if gdp_view == "Highest 3 Countries performance since 2000":
+            with timed_view("Highest 3 Countries performance since 2000"):
+                Country_highest_gdp = energy_views.gdp_history(Energy_tables, selected_year, highest=True)
+                fig=cached_figure("gdp-highest-3", selected_year, lambda: px.line(
+                        Country_highest_gdp, 
+                        x='Year',
+                        y='gdp_per_capita',
+                        color='Entity', 
+                        title='Highest 3 GDP per Capita Over Time', 
+                        labels={'Year': 'Year', 'gdp_per_capita': 'Highest 3 GDP per Capita ($)'}))
+                st.plotly_chart(fig, use_container_width=True)
 
 
 
 
     ####################"Electricity Access"###################################
-    with tab2:
-        menu = st.radio("Display", ["data for Year 2020",
+    if category == "Electricity Access":
+        year_view = "data for Year"
+        menu = st.radio("Display", [year_view,
                                     "Features correlations",
                                     "Graphs",
                                     "Trends in Electricity Access and Renewable Energy Adoption by Entity",
-                                    "Summary"], index=0, horizontal=True)
+                                    "Summary"], index=0, horizontal=True,
+                        format_func=lambda v: f"{v} {selected_year}" if v == year_view else v)
+        # Only the columns this tab shows are read from the columnar cache
+        Access_tables = projected_tables(dataset, energy_views.ACCESS_COLUMNS)
         
-        if menu == "data for Year 2020":
-            st.subheader("Entities with lowest access to electricity")
-            # Filter the data for Year 2020
-            lowest_access_2020 = Energy_data[Energy_data['Year'] == 2020]
-            lowest_access_2020 = lowest_access_2020.sort_values(by='Access to electricity (% of population)').drop_duplicates(subset='Entity').head(10)
-            main_characteristics =["Entity","Year",
-                                   "Access to electricity (% of population)",
-                                   "gdp_per_capita",
-                                   "Land Area(Km2)",
-                                   "Population"]
-            lowest_access_df=lowest_access_2020[main_characteristics]
-            st.dataframe(lowest_access_df)
-
-            st.subheader("Entities with highest access to electricity")
-            st.write("Random Samples")
-            Highest_access_2020 = Energy_data[Energy_data['Year'] == 2020]
-            Highest_access_2020 = Highest_access_2020.sort_values(by='Access to electricity (% of population)').drop_duplicates(subset='Entity').tail(20)
-            Highest_access_df=Highest_access_2020[main_characteristics]
-            st.dataframe(Highest_access_df)
+        if menu == year_view:
+            with timed_view(year_view):
+                lowest_access_df = view_table("access_lowest", selected_year, tables=Access_tables)
+                Highest_access_df = view_table("access_highest", selected_year, tables=Access_tables)
+                st.subheader("Entities with lowest access to electricity")
+                paged_table("access-lowest", energy_serving.TableServer(lowest_access_df))
+
+                st.subheader("Entities with highest access to electricity")
+                st.write("Random Samples")
+                paged_table("access-highest", energy_serving.TableServer(Highest_access_df))
 
         if menu == "Features correlations":
-            corr1 = Energy_data[['Access to electricity (% of population)',
-                                      'gdp_per_capita',
-                                      'Land Area(Km2)',
-                                      'Population']].corr()
+            only_year = st.checkbox(f"Only the year {selected_year}")
+            corr_entities = st.multiselect("Only these entities", Energy_tables.entities.tolist())
+            with timed_view("Features correlations"):
+                corr_year = selected_year if only_year else None
+                corr_entities = tuple(sorted(corr_entities)) or None
+                corr1 = energy_views.access_correlations(Energy_correlations, year=corr_year, entities=corr_entities)
             
-            characteristics_fig= px.imshow(
-                corr1,
-                text_auto=True,
-                title="Access to electricity Correlation Heatmap"
-            )
-            characteristics_fig.update_layout(width=1000, height=600)
-            st.plotly_chart(characteristics_fig, use_container_width=True)
+                characteristics_fig= cached_figure("access-correlations", (corr_year, corr_entities), lambda: px.imshow(
+                    corr1,
+                    text_auto=True,
+                    title="Access to electricity Correlation Heatmap"
+                ).update_layout(width=1000, height=600))
+                st.plotly_chart(characteristics_fig, use_container_width=True)
 
         if menu == "Graphs":
-            st.subheader("Entities with lowest access to electricity 2020")
-            lowest_access_2020 = Energy_data[Energy_data['Year'] == 2020]
-            lowest_access_2020 = lowest_access_2020.sort_values(by='Access to electricity (% of population)').drop_duplicates(subset='Entity').head(10)
-            main_characteristics =["Entity","Year",
-                                   "Access to electricity (% of population)",
-                                   "gdp_per_capita",
-                                   "Land Area(Km2)",
-                                   "Population"]
-            lowest_access_df=lowest_access_2020[main_characteristics]
-            fig_scatter = px.scatter(lowest_access_df, x='Access to electricity (% of population)',
-                         y='gdp_per_capita',
-                         title='Access to Electricity vs GDP per Capita',
-                        width=600,height=600)
-            fig_scatter_l, ax=plt.subplots()
-            sns.scatterplot(x='Population',
-                            y='gdp_per_capita',
-                            data=lowest_access_df,
-                            hue='Access to electricity (% of population)',
-                           ax=ax)
-            plt.title("Lowest Countries access to electricty : Gdp vs Population")
-            st.plotly_chart(fig_scatter, use_container_width=True)
-            st.pyplot(fig_scatter_l)
-
-            st.subheader("Entities with highest access to electricity 2020")
-            st.write("Random Samples")
-            Highest_access_2020 = Energy_data[Energy_data['Year'] == 2020]
-            Highest_access_2020 = Highest_access_2020.sort_values(by='Access to electricity (% of population)').drop_duplicates(subset='Entity').tail(20)
-            Highest_access_df=Highest_access_2020[main_characteristics]
-            fig_scatter1 = px.scatter(Highest_access_df, x='Access to electricity (% of population)',
-                         y='gdp_per_capita',
-                         title='Access to Electricity vs GDP per Capita',
-                        width=600,height=600)
-            fig_scatter1_h,ax=plt.subplots()
-            sns.scatterplot(x='Population',
-                            y='gdp_per_capita',
-                            data=Highest_access_df,
-                            hue='Access to electricity (% of population)',ax=ax)
-            plt.title("highest Countries access to electricty : Gdp vs Population")
-            st.plotly_chart(fig_scatter1, use_container_width=True)
-            st.pyplot(fig_scatter1_h)
+            with timed_view("Graphs"):
+                lowest_access_df = view_table("access_lowest", selected_year, tables=Access_tables)
+                Highest_access_df = view_table("access_highest", selected_year, tables=Access_tables)
+                st.subheader(f"Entities with lowest access to electricity {selected_year}")
+                fig_scatter = cached_figure("access-lowest-scatter", selected_year, lambda: energy_charts.scatter(lowest_access_df, x='Access to electricity (% of population)',
+                             y='gdp_per_capita',
+                             title='Access to Electricity vs GDP per Capita',
+                            width=600,height=600))
+                st.plotly_chart(fig_scatter, use_container_width=True)
+                if energy_charts.chart_backend() == "seaborn":
+                    def draw_lowest_access(fig):
+                        ax = fig.subplots()
+                        sns.scatterplot(x='Population',
+                                        y='gdp_per_capita',
+                                        data=lowest_access_df,
+                                        hue='Access to electricity (% of population)',
+                                       ax=ax)
+                        ax.set_title("Lowest Countries access to electricty : Gdp vs Population")
+                    fig_scatter_l = cached_figure("access-lowest-population", selected_year,
+                                                  lambda: energy_figures.render_png(draw_lowest_access))
+                    st.image(fig_scatter_l, use_container_width=True)
+                else:
+                    fig_scatter_l = cached_figure("access-lowest-population-plotly", selected_year, lambda: energy_charts.scatter(
+                        lowest_access_df,
+                        x='Population',
+                        y='gdp_per_capita',
+                        color='Access to electricity (% of population)',
+                        title="Lowest Countries access to electricty : Gdp vs Population"))
+                    st.plotly_chart(fig_scatter_l, use_container_width=True)
+
+                st.subheader(f"Entities with highest access to electricity {selected_year}")
+                st.write("Random Samples")
+                fig_scatter1 = cached_figure("access-highest-scatter", selected_year, lambda: energy_charts.scatter(Highest_access_df, x='Access to electricity (% of population)',
+                             y='gdp_per_capita',
+                             title='Access to Electricity vs GDP per Capita',
+                            width=600,height=600))
+                st.plotly_chart(fig_scatter1, use_container_width=True)
+                if energy_charts.chart_backend() == "seaborn":
+                    def draw_highest_access(fig):
+                        ax = fig.subplots()
+                        sns.scatterplot(x='Population',
+                                        y='gdp_per_capita',
+                                        data=Highest_access_df,
+                                        hue='Access to electricity (% of population)',ax=ax)
+                        ax.set_title("highest Countries access to electricty : Gdp vs Population")
+                    fig_scatter1_h = cached_figure("access-highest-population", selected_year,
+                                                   lambda: energy_figures.render_png(draw_highest_access))
+                    st.image(fig_scatter1_h, use_container_width=True)
+                else:
+                    fig_scatter1_h = cached_figure("access-highest-population-plotly", selected_year, lambda: energy_charts.scatter(
+                        Highest_access_df,
+                        x='Population',
+                        y='gdp_per_capita',
+                        color='Access to electricity (% of population)',
+                        title="highest Countries access to electricty : Gdp vs Population"))
+                    st.plotly_chart(fig_scatter1_h, use_container_width=True)
         if menu == "Trends in Electricity Access and Renewable Energy Adoption by Entity":
-            Afga_Egypt_df = Energy_data[["Entity", "Year", "Access to electricity (% of population)",
-                                         "Renewable energy share in the total final energy consumption (%)"]]
-    
-            # Create a list of unique country names for the dropdown
-            country_list = Afga_Egypt_df['Entity'].unique().tolist()
+            with timed_view("Trends in Electricity Access and Renewable Energy Adoption by Entity"):
+                trend_columns = energy_views.TREND_COLUMNS
+                country_list = Energy_tables.entities.tolist()
             
-            # Add a select box for the user to choose a country
-            selected_country = st.selectbox("Select a Country", options=country_list)
+                # Add a select box for the user to choose one or more countries
+                selected_countries = st.multiselect("Select a Country", options=country_list,
+                                                    default=country_list[:1])
             
-            # Filter the data based on the selected country
-            Afga_df = Afga_Egypt_df[Afga_Egypt_df['Entity'] == selected_country]
-            evolved_fig = px.line(Afga_df,
-                                  x='Year',
-                                  y=['Access to electricity (% of population)',"Renewable energy share in the total final energy consumption (%)"],
-                                  labels={'value': 'Percent', 'variable': 'Data'},
-                                  title="Evolution of Electricity Access, Renewable Energy over time")
-            st.plotly_chart(evolved_fig, use_container_width=True)
+                # Each country's series is a slice lookup in the entity index
+                Afga_df = energy_views.entity_trends(Energy_tables, selected_countries)
+                if len(selected_countries) == 1:
+                    evolved_fig = cached_figure("access-trends", tuple(selected_countries), lambda: px.line(Afga_df,
+                                          x='Year',
+                                          y=trend_columns,
+                                          labels={'value': 'Percent', 'variable': 'Data'},
+                                          title="Evolution of Electricity Access, Renewable Energy over time"))
+                else:
+                    # Comparing countries: one color per country, one dash style per measure
+                    evolved_fig = cached_figure("access-trends", tuple(selected_countries), lambda: px.line(
+                                          Afga_df.melt(id_vars=["Entity", "Year"], value_vars=trend_columns),
+                                          x='Year',
+                                          y='value',
+                                          color='Entity',
+                                          line_dash='variable',
+                                          labels={'value': 'Percent', 'variable': 'Data'},
+                                          title="Evolution of Electricity Access, Renewable Energy over time"))
+                st.plotly_chart(evolved_fig, use_container_width=True)
+
+                # Scenarios only re-evaluate the cached trend fits
+                st.markdown(f"### Projections to {energy_projections.HORIZON}")
+                engine = projection_engine(dataset)
+                share_col, co2_col = st.columns(2)
+                share_adjustment = share_col.slider("Renewable share growth on top of the trend (points per year)",
+                                                    -2.0, 2.0, 0.0, 0.1)
+                co2_adjustment = co2_col.slider("CO2 emissions growth on top of the trend (% per year)",
+                                                -10.0, 10.0, 0.0, 0.5)
+                for column, metric, adjustment, label in (
+                        (share_col, energy_projections.RENEWABLE_SHARE, share_adjustment, "Percent"),
+                        (co2_col, energy_projections.CO2, co2_adjustment, "kt")):
+                    projection_fig = cached_figure(f"projection {metric}", (tuple(selected_countries), adjustment),
+                                                   lambda: px.line(engine.scenario(metric, selected_countries,
+                                                                                   adjustment=adjustment),
+                                                                   x="Year", y="value", color="Entity",
+                                                                   line_dash="Series",
+                                                                   labels={"value": label},
+                                                                   title=metric))
+                    column.plotly_chart(projection_fig, use_container_width=True)
             
             
 
         if menu =="Summary":
+            with timed_view("Summary"):
             
-            st.subheader("Summary of Results")
-            st.markdown("### Lowest Entities have Access to Electricity")
-            st.markdown("""
-            - **Entities with the lowest access to electricity** in 2020 show:
-                - Countries in this group tend to have access rates below 30%, indicating significant energy poverty.
-                - A positive relationship between GDP per capita and access to electricity: Countries with higher GDP per capita tend to have better electricity access.
-                - Population and GDP per capita do not show a clear pattern. Even populous countries can have low GDP and limited electricity access.
+                st.subheader("Summary of Results")
+                st.markdown("### Lowest Entities have Access to Electricity")
+                st.markdown("""
+                - **Entities with the lowest access to electricity** in 2020 show:
+                    - Countries in this group tend to have access rates below 30%, indicating significant energy poverty.
+                    - A positive relationship between GDP per capita and access to electricity: Countries with higher GDP per capita tend to have better electricity access.
+                    - Population and GDP per capita do not show a clear pattern. Even populous countries can have low GDP and limited electricity access.
                 
-            """)
-            st.markdown("### Highest Entities have Access to Electricity")
-            st.markdown("""
-            - **Entities with the highest access to electricity** in 2020 show:
-                - Near universal access to electricity (>90% of the population), indicating well-developed infrastructure.
-                - A positive relationship between GDP per capita and electricity access, although less pronounced than in the lowest-access group (likely due to saturation in electricity access).
-                - Populous countries with high GDP tend to have near-complete access to electricity.
-            """)
+                """)
+                st.markdown("### Highest Entities have Access to Electricity")
+                st.markdown("""
+                - **Entities with the highest access to electricity** in 2020 show:
+                    - Near universal access to electricity (>90% of the population), indicating well-developed infrastructure.
+                    - A positive relationship between GDP per capita and electricity access, although less pronounced than in the lowest-access group (likely due to saturation in electricity access).
+                    - Populous countries with high GDP tend to have near-complete access to electricity.
+                """)
 
             
 ####################"Regional Insights"################################           
-    with tab3:
-        TAB1,TAB2,TAB3=st.tabs(["Renewable Energy Share by Country Over years",
-                                    "Geographic Influence on Energy Access,Renewable Adoption,CO2 Emissions",
-                                    "GDP vs. Primary Energy Consumption Per Capita"])
-        with TAB1:
-            
-            map_fig = px.choropleth(Energy_data, 
-                        locations='Entity', 
-                        locationmode='country names', 
-                        color='Renewable energy share in the total final energy consumption (%)', 
-                        hover_name='Entity', 
-                        hover_data=['Year', 'Land Area(Km2)', 'Density','gdp_per_capita'],
-                        title='Renewable Energy Share by Country Over Years',
-                        animation_frame="Year")
-            st.plotly_chart(map_fig, use_container_width=True)
+    if category == "Regional Insights":
+        regional_view = st.radio("Regional view", ["Renewable Energy Share by Country Over years",
+                                                   "Geographic Influence on Energy Access,Renewable Adoption,CO2 Emissions",
+                                                   "GDP vs. Primary Energy Consumption Per Capita"],
+                                 index=0, horizontal=True, label_visibility="collapsed")
+        if regional_view == "Renewable Energy Share by Country Over years":
+            map_mode = st.radio("Map mode", ["All years (animation)", "One year at a time"],
+                                index=0, horizontal=True)
+            # One year at a time only builds and ships the frame on the slider
+            map_year = None
+            if map_mode == "One year at a time":
+                map_year = st.select_slider("Map year", options=Energy_tables.years, value=selected_year)
+            with timed_view("Renewable Energy Share by Country Over years"):
+                if map_year is None:
+                    map_fig = cached_figure("renewable-map", None, lambda: energy_charts.renewable_choropleth(Energy_tables.data))
+                else:
+                    map_fig = cached_figure("renewable-map", map_year,
+                                            lambda: energy_charts.renewable_choropleth(Energy_tables.year(map_year), animate=False))
+                st.plotly_chart(map_fig, use_container_width=True)
     
-        with TAB2:
-            Geo_data = Energy_data[['Latitude', 'Longitude', 'Land Area(Km2)', 'Density', 
-                         'Access to electricity (% of population)', 
-                         'Renewable energy share in the total final energy consumption (%)', 
-                         'Value_co2_emissions_kt_by_country']]
-            Geo_data = Geo_data.sort_values(by = "Value_co2_emissions_kt_by_country").corr()
-            st.subheader("Correlation Analysis")
-            st.dataframe(Geo_data)
-            st.subheader("Top Emitters")
-            fig_Geo = px.scatter_geo(
-                Energy_data.drop_duplicates("Entity",keep="last").sort_values(by= "Value_co2_emissions_kt_by_country").tail(10),
-                lat='Latitude',
-                lon='Longitude',
-                size= 'Access to electricity (% of population)', 
-                color='Value_co2_emissions_kt_by_country',
-                color_continuous_scale='Inferno',  
-                hover_name='Entity', 
-                hover_data={'Land Area(Km2)','Density'},height=550,width=1100,
-                title='CO2 Emissions by Country in 2020')
-            st.plotly_chart(fig_Geo, use_container_width=True)
+        if regional_view == "Geographic Influence on Energy Access,Renewable Adoption,CO2 Emissions":
+            all_points, geo_extent = map_points_controls("geo-emitters")
+            with timed_view("Geographic Influence on Energy Access,Renewable Adoption,CO2 Emissions"):
+                Geo_data = energy_views.geo_correlations(Energy_correlations)
+                st.subheader("Correlation Analysis")
+                st.dataframe(Geo_data)
+                st.subheader("Top Emitters")
+                if not all_points:
+                    fig_Geo = cached_figure("geo-top-emitters", None, lambda: px.scatter_geo(
+                        view_table("geo_top_emitters"),
+                        lat='Latitude',
+                        lon='Longitude',
+                        size= 'Access to electricity (% of population)', 
+                        color='Value_co2_emissions_kt_by_country',
+                        color_continuous_scale='Inferno',  
+                        hover_name='Entity', 
+                        hover_data={'Land Area(Km2)','Density'},height=550,width=1100,
+                        title='CO2 Emissions by Country in 2020'))
+                else:
+                    fig_Geo = cached_figure("geo-emitters", geo_extent, lambda: energy_charts.geo_scatter(
+                        energy_views.geo_points(Energy_tables),
+                        size='Access to electricity (% of population)',
+                        color='Value_co2_emissions_kt_by_country',
+                        hover_data=['Land Area(Km2)', 'Density'],
+                        extent=geo_extent,
+                        sums=['Value_co2_emissions_kt_by_country', 'Land Area(Km2)'],
+                        means=['Access to electricity (% of population)', 'Density'],
+                        color_continuous_scale='Inferno', height=550, width=1100,
+                        title='CO2 Emissions by Country'))
+                st.plotly_chart(fig_Geo, use_container_width=True)
             
-        with TAB3:
-            fig_Geo1 = px.scatter_geo(
-                Energy_data.drop_duplicates("Entity",keep="last").sort_values(by= "gdp_per_capita").tail(10),
-                lat='Latitude',
-                lon='Longitude',
-                color='gdp_per_capita',
-                size= 'Primary energy consumption per capita (kWh/person)',
-                hover_name='Entity',
-                hover_data={'Land Area(Km2)','Density'},height=550,width=1100,
-                title='GDP and primary energy consumption per capita')
-            st.plotly_chart(fig_Geo1, use_container_width=True)
+        if regional_view == "GDP vs. Primary Energy Consumption Per Capita":
+            all_points, geo_extent = map_points_controls("geo-gdp")
+            with timed_view("GDP vs. Primary Energy Consumption Per Capita"):
+                if not all_points:
+                    fig_Geo1 = cached_figure("geo-top-gdp", None, lambda: px.scatter_geo(
+                        view_table("geo_top_gdp"),
+                        lat='Latitude',
+                        lon='Longitude',
+                        color='gdp_per_capita',
+                        size= 'Primary energy consumption per capita (kWh/person)',
+                        hover_name='Entity',
+                        hover_data={'Land Area(Km2)','Density'},height=550,width=1100,
+                        title='GDP and primary energy consumption per capita'))
+                else:
+                    fig_Geo1 = cached_figure("geo-gdp", geo_extent, lambda: energy_charts.geo_scatter(
+                        energy_views.geo_points(Energy_tables),
+                        size='Primary energy consumption per capita (kWh/person)',
+                        color='gdp_per_capita',
+                        hover_data=['Land Area(Km2)', 'Density'],
+                        extent=geo_extent,
+                        sums=['Land Area(Km2)'],
+                        means=['Primary energy consumption per capita (kWh/person)', 'gdp_per_capita', 'Density'],
+                        height=550, width=1100,
+                        title='GDP and primary energy consumption per capita'))
+                st.plotly_chart(fig_Geo1, use_container_width=True)
           
 
 ####################"Low Emitters"################################ 
-    with tab4:
-        st.subheader("entities with top percentage of low-carbon electricity")
-        correlation_matrix= Energy_data[["Entity","Year","Low-carbon electricity (% electricity)","gdp_per_capita"]]
-        correlation_matrix=correlation_matrix.drop_duplicates("Entity",keep="last").sort_values(by=("Low-carbon electricity (% electricity)"),ascending= False)
-        st.dataframe(correlation_matrix.head(10))
+    if category == "Low CO2 Emitters":
+        with timed_view("Low CO2 Emitters"):
+            st.subheader("entities with top percentage of low-carbon electricity")
+            paged_table("low-carbon", energy_serving.TableServer(view_table("low_carbon_ranking")))
         
 ###############entities have reduced CO2 emissions over time##############################
-    with tab5:
-        agg_emissions = Energy_data.groupby('Entity').agg(
-            emission_2000=('Value_co2_emissions_kt_by_country', 'first'),
-            emission_2020=('Value_co2_emissions_kt_by_country', 'last'))
-
-        #calcuting differnce
-        agg_emissions['emission_difference'] = agg_emissions['emission_2000'] - agg_emissions['emission_2020']
-        # Find entities where last emission is less than the first
-        reduced_emissions = agg_emissions[agg_emissions['emission_2020'] < agg_emissions['emission_2000']]
-        plot_data=reduced_emissions.sort_values("emission_difference",ascending=False)
-        emissions_fig = px.bar(plot_data,
-                       x=plot_data.index,
-                       y="emission_difference",
-                       labels=["Country","emission_difference(2000-2020)"],
-                       title='Reduced CO₂ Emission Difference between 2000 and 2020 for Countries',
-                       color="emission_difference",
-                      height=600)
-        st.plotly_chart(emissions_fig, useuse_container_width= False)
+    if category == "Entities have reduced CO2 emissions over time":
+        start_year, end_year = st.select_slider("Period", options=Energy_tables.years,
+                                                value=(Energy_tables.years[0], Energy_tables.years[-1]))
+        with timed_view("Entities have reduced CO2 emissions over time"):
+            # Entities where last emission is less than the first
+            plot_data = view_table("emissions_reduction", start_year, end_year)
+            emissions_fig = cached_figure("co2-reduction", (start_year, end_year), lambda: px.bar(plot_data,
+                           x=plot_data.index,
+                           y="emission_difference",
+                           labels={"Entity": "Country", "emission_difference": f"emission_difference({start_year}-{end_year})"},
+                           title=f'Reduced CO₂ Emission Difference between {start_year} and {end_year} for Countries',
+                           color="emission_difference",
+                          height=600))
+            st.plotly_chart(emissions_fig, use_container_width= False)
         
         
 # Conclusion
@@ -469,3 +738,7 @@ elif menu == "Conclusion":
     st.write("""
     The transition to low-carbon energy systems is gaining momentum, particularly in Europe and parts of Asia, driven by technological advancements, cost reductions, and international agreements. However, achieving universal energy access and accelerating the global energy transition will require targeted investments, policy innovations, and efforts to address economic and geographic disparities. The success of renewable energy leaders like Norway and Iceland provides valuable insights for other nations aiming to achieve sustainable energy systems.
     """)
+
+profile_record = energy_profiling.finish_rerun(page)
+if profile_record is not None:
+    profiling_panel(profile_record)
@@ -0,0 +1,647 @@
+"""Benchmarks for the Sustainable-Energy app.
+
+Usage:
+    python benchmark.py [section ...] [--scales 1 100 1000]
+
+Run without arguments to run every section. Each section prints one line per
+measurement so the output can be diffed between runs.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import energy_data
+import energy_tables
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sustainable-Energy.py")
+SCALES = (1, 10, 100, 1000)
+
+# Loads one file in a fresh interpreter and prints wall time (s) and peak RSS (KB)
+COLD_LOAD = """
+import resource, sys, time
+import energy_data
+import energy_tables
+start = time.perf_counter()
+if sys.argv[1] == "csv":
+    energy_data.read_energy_csv(sys.argv[2])
+else:
+    energy_data.pd.read_parquet(sys.argv[2], memory_map=True)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def timed(func, *args, repeat=5, **kwargs):
+    """Return (best wall time in ms, peak traced memory in MB, last result)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / 2**20, result
+
+
+def rss_mb():
+    """Return the current resident set size in MB (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(name, ms, mb=None):
+    line = f"{name:<55} {ms:10.2f} ms"
+    if mb is not None:
+        line += f" {mb:10.2f} MB"
+    print(line)
+
+
+def synthetic_energy_data(scale):
+    """Return Energy_data.csv repeated `scale` times, each copy with its own entities."""
+    base = energy_data.read_energy_csv(energy_data.DATA_PATH)
+    base["Entity"] = base["Entity"].astype(str)
+    copies = [base.assign(Entity=base["Entity"] + (f" #{i}" if i else "")) for i in range(scale)]
+    data = pd.concat(copies, ignore_index=True)
+    data["Entity"] = data["Entity"].astype("category")
+    return data
+
+
+def bench_load(scales):
+    """Untyped read_csv vs the typed loader, and the per-rerun cost of each."""
+    path = energy_data.DATA_PATH
+    ms, mb, plain = timed(pd.read_csv, path)
+    report("load: read_csv (untyped)", ms, mb)
+    ms, mb, typed = timed(energy_data.read_energy_data, path)
+    report("load: read_energy_data (typed)", ms, mb)
+    # On a cached rerun the app only re-stats the file to build its version key
+    ms, _, _ = timed(energy_data.dataset_version, path, repeat=50)
+    report("load: cached rerun (dataset_version)", ms)
+    print(f"{'load: frame size untyped':<55} {plain.memory_usage(deep=True).sum() / 2**20:10.2f} MB")
+    print(f"{'load: frame size typed':<55} {typed.memory_usage(deep=True).sum() / 2**20:10.2f} MB")
+
+
+def bench_columnar(scales):
+    """Cold load of the CSV vs its Parquet cache, each in a fresh process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            csv_path = os.path.join(tmp, f"energy_{scale}x.csv")
+            synthetic_energy_data(scale).to_csv(csv_path, index=False)
+            parquet_path = energy_data.convert_to_columnar(csv_path)
+            for fmt, path in (("csv", csv_path), ("parquet", parquet_path)):
+                out = subprocess.run([sys.executable, "-c", COLD_LOAD, fmt, path],
+                                     capture_output=True, text=True, check=True,
+                                     cwd=os.path.dirname(APP_PATH)).stdout.split()
+                report(f"columnar: {scale}x cold load {fmt}", float(out[0]) * 1000, int(out[1]) / 1024)
+
+
+def bench_tables(scales):
+    """Per-rerun year filter + sort vs lookups in the precomputed EnergyTables."""
+    access = "Access to electricity (% of population)"
+    for scale in scales:
+        data = synthetic_energy_data(scale)
+        year = int(data["Year"].max())
+
+        def scan():
+            rows = data[data["Year"] == year]
+            rows.sort_values(by="gdp_per_capita", ascending=False)[0:10]
+            rows.sort_values(by=access).drop_duplicates(subset="Entity").head(10)
+
+        ms, mb, _ = timed(scan)
+        report(f"tables: {scale}x filter and sort per view", ms, mb)
+        ms, mb, tables = timed(energy_tables.EnergyTables, data, repeat=1)
+        report(f"tables: {scale}x build EnergyTables (once)", ms, mb)
+        ms, _, _ = timed(lambda: (tables.top("gdp_per_capita", 10, year),
+                                  tables.bottom(access, 10, year)))
+        report(f"tables: {scale}x lookup per view", ms)
+
+
+# Imports of the app script on a worker's cold start, past streamlit itself,
+# as measured by `python -X importtime`; `startup` fails above this. Nearly
+# all of it is pandas (450-550 ms here), which every page needs; seaborn
+# alone would add another 500 ms
+STARTUP_IMPORT_BUDGET_MS = 800
+
+# Runs the app script's imports in a fresh interpreter under -X importtime,
+# after streamlit (which the worker has loaded before it runs the script)
+STARTUP_IMPORTS = """
+import streamlit, sys
+sys.stderr.write("-- script imports --\\n")
+{imports}
+import energy_imports
+print(" ".join(m for m in energy_imports.DEFERRED_MODULES if m in sys.modules))
+"""
+
+# First run of the app in a fresh interpreter, the way a new worker serves its first page
+COLD_START = """
+import sys, time
+import energy_imports
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+framework = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+end = time.perf_counter()
+print(framework - start, end - framework, " ".join(m for m in energy_imports.DEFERRED_MODULES if m in sys.modules))
+"""
+
+
+def script_imports(path=APP_PATH):
+    """Return the top-level import statements of the app script, as source."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_times(stderr):
+    """Return {module: cumulative µs} of the top-level imports in -X importtime output after the marker."""
+    lines = stderr.split("-- script imports --\n", 1)[1].splitlines()
+    entries = []
+    for line in lines:
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line.split(":", 1)[1].split("|")
+            entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    top = min((indent for indent, _, _ in entries), default=0)
+    return {name: cumulative for indent, name, cumulative in entries if indent == top}
+
+
+def bench_startup(scales, runs=3, budget_ms=STARTUP_IMPORT_BUDGET_MS):
+    """Import time of the app script and the first run of a fresh worker.
+
+    Fails when the script's imports take more than `budget_ms` or import
+    one of energy_imports.DEFERRED_MODULES, which only the views drawing
+    with them should import.
+    """
+    code = STARTUP_IMPORTS.format(imports=script_imports())
+    best, loaded = None, ""
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(APP_PATH))
+        times = import_times(result.stderr)
+        if best is None or sum(times.values()) < sum(best.values()):
+            best, loaded = times, result.stdout.strip()
+    total_ms = sum(best.values()) / 1000
+    report("startup: script imports (-X importtime)", total_ms)
+    for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[:5]:
+        report(f"  {name}", cumulative / 1000)
+
+    cold = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", COLD_START, APP_PATH], capture_output=True, text=True,
+                             check=True, cwd=os.path.dirname(APP_PATH)).stdout.split(maxsplit=2)
+        cold.append((float(out[0]) * 1000, float(out[1]) * 1000, out[2].strip() if len(out) > 2 else ""))
+    framework_ms, first_run_ms, cold_loaded = min(cold, key=lambda run: run[1])
+    report("startup: worker cold start, streamlit import", framework_ms)
+    report("startup: worker cold start, first run", first_run_ms)
+
+    ok = True
+    if total_ms > budget_ms:
+        print(f"startup: FAILED, script imports took {total_ms:.0f} ms, over the {budget_ms} ms budget")
+        ok = False
+    for modules, when in ((loaded, "by the script's imports"), (cold_loaded, "on the first page")):
+        if modules:
+            print(f"startup: FAILED, {modules} imported {when}")
+            ok = False
+    return ok
+
+
+def _radio(app, label):
+    return next(radio for radio in app.radio if radio.label == label)
+
+
+def bench_changes(scales):
+    """groupby first/last vs the Entity x Year matrix in EnergyTables."""
+    co2 = "Value_co2_emissions_kt_by_country"
+    for scale in scales:
+        tables = energy_tables.EnergyTables(synthetic_energy_data(scale))
+        start, end = tables.years[0], tables.years[-1]
+        ms, mb, _ = timed(lambda: tables.data.groupby("Entity", observed=True).agg(
+            first=(co2, "first"), last=(co2, "last")))
+        report(f"changes: {scale}x groupby first/last", ms, mb)
+        ms, _, _ = timed(tables.matrix, co2, repeat=1)
+        report(f"changes: {scale}x build matrix (once per metric)", ms)
+        ms, mb, _ = timed(lambda: (tables._changes.clear(), tables.change(co2, start, end)))
+        report(f"changes: {scale}x change from matrix", ms, mb)
+
+
+def bench_series(scales):
+    """Boolean scan per country vs the entity slice index in EnergyTables."""
+    columns = ["Entity", "Year", "Access to electricity (% of population)",
+               "Renewable energy share in the total final energy consumption (%)"]
+    for scale in scales:
+        tables = energy_tables.EnergyTables(synthetic_energy_data(scale))
+        countries = tables.entities[:5].tolist()
+        ms, mb, _ = timed(lambda: tables.data[columns][tables.data["Entity"].isin(countries)])
+        report(f"series: {scale}x boolean scan, 5 countries", ms, mb)
+        ms, mb, _ = timed(tables.series, countries, columns)
+        report(f"series: {scale}x slice lookup, 5 countries", ms, mb)
+
+
+def bench_correlations(scales):
+    """DataFrame.corr() per rerun vs CorrelationService from cached statistics."""
+    import energy_correlations
+
+    columns = ["Latitude", "Longitude", "Land Area(Km2)", "Density",
+               "Access to electricity (% of population)",
+               "Renewable energy share in the total final energy consumption (%)",
+               "Value_co2_emissions_kt_by_country"]
+    for scale in scales:
+        tables = energy_tables.EnergyTables(synthetic_energy_data(scale))
+        ms, mb, _ = timed(lambda: tables.data[columns].corr())
+        report(f"correlations: {scale}x DataFrame.corr", ms, mb)
+        service = energy_correlations.CorrelationService(tables)
+        ms, _, _ = timed(service.corr, columns, repeat=1)
+        report(f"correlations: {scale}x build statistics (once)", ms)
+        ms, _, _ = timed(service.corr, columns)
+        report(f"correlations: {scale}x from statistics", ms)
+        ms, _, _ = timed(service.corr, columns, year=tables.years[-1])
+        report(f"correlations: {scale}x one year from statistics", ms)
+        subset = list(tables.entities[::max(1, len(tables.entities) // 5)][:5])
+        ms, _, _ = timed(service.corr, columns, entities=subset)
+        report(f"correlations: {scale}x 5 entities", ms)
+        ms, _, _ = timed(service.corr, columns, year=tables.years[-1], entities=subset)
+        report(f"correlations: {scale}x 5 entities, one year", ms)
+        # Subsets are read by entity slice: the cost follows the subset, not the data
+        ms, _, _ = timed(service.corr, columns, entities=list(tables.entities[:172]))
+        report(f"correlations: {scale}x 172 entities", ms)
+
+
+def bench_choropleth(scales):
+    """Build time and JSON payload of the renewable share choropleth, both modes."""
+    import energy_charts
+
+    for scale in scales:
+        tables = energy_tables.EnergyTables(synthetic_energy_data(scale))
+        year = tables.years[-1]
+        original = lambda: energy_charts.px.choropleth(
+            tables.data, locations="Entity", locationmode="country names",
+            color=energy_charts.RENEWABLE_SHARE, hover_name="Entity",
+            hover_data=energy_charts.CHOROPLETH_HOVER, animation_frame="Year")
+        for mode, build in (("original all frames", original),
+                            ("all frames", lambda: energy_charts.renewable_choropleth(tables.data)),
+                            ("one year", lambda: energy_charts.renewable_choropleth(tables.year(year), animate=False))):
+            ms, _, fig = timed(build, repeat=3)
+            report(f"choropleth: {scale}x {mode} build", ms)
+            print(f"{f'choropleth: {scale}x {mode} payload':<55} {len(fig.to_json()) / 2**20:10.2f} MB")
+
+
+def bench_lod(scales):
+    """Figure JSON sizes and build times of the level-of-detail scatter builders.
+
+    Copies of Energy_data.csv get their coordinates jittered by up to 3
+    degrees, so binned maps see spread-out points rather than stacked ones.
+    """
+    import numpy as np
+
+    import energy_charts
+
+    co2 = "Value_co2_emissions_kt_by_country"
+    access = "Access to electricity (% of population)"
+    rng = np.random.default_rng(0)
+    for scale in scales:
+        points = energy_tables.EnergyTables(synthetic_energy_data(scale)).latest
+        points = points.assign(Latitude=points["Latitude"] + rng.uniform(-3, 3, len(points)),
+                               Longitude=points["Longitude"] + rng.uniform(-3, 3, len(points)))
+        builds = {
+            "scatter svg": lambda: energy_charts.scatter(points, access, "gdp_per_capita", webgl_threshold=len(points)),
+            "scatter auto": lambda: energy_charts.scatter(points, access, "gdp_per_capita"),
+            "geo raw": lambda: energy_charts.geo_scatter(points, access, co2, ["Density"], budget=len(points)),
+            "geo binned": lambda: energy_charts.geo_scatter(points, access, co2, ["Density"], sums=[co2],
+                                                            means=[access, "Density"]),
+            "geo binned, Europe": lambda: energy_charts.geo_scatter(points, access, co2, ["Density"],
+                                                                    extent=((35, 70), (-25, 45)), sums=[co2],
+                                                                    means=[access, "Density"]),
+        }
+        for name, build in builds.items():
+            ms, _, fig = timed(build, repeat=3)
+            report(f"lod: {len(points)} points {name} build", ms)
+            markers = sum(len(trace.marker.size) for trace in fig.data if trace.marker.size is not None) or \
+                sum(len(trace.x) for trace in fig.data)
+            print(f"{f'lod: {len(points)} points {name} payload':<55} {len(fig.to_json()) / 2**10:10.0f} KB"
+                  f" ({fig.data[0].type}, {markers} markers)")
+
+
+def bench_figure_cache(scales, reruns=1000, max_growth_mb=50):
+    """Simulated reruns through the FigureCache, checking that memory stays flat.
+
+    Each rerun asks for one Plotly figure and one seaborn PNG for a year,
+    cycling through the years, after one warm-up cycle. The check fails when RSS grows by more than
+    `max_growth_mb` over the reruns. The old pyplot path (plt.figure() and
+    no close) is run for a tenth of the reruns for comparison.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import plotly.express as px
+    import seaborn as sns
+
+    import energy_figures
+
+    tables = energy_tables.EnergyTables(energy_data.read_energy_data())
+    cache = energy_figures.FigureCache(max_entries=64, max_bytes=16 * 2**20)
+
+    def rerun(i):
+        year = tables.years[i % len(tables.years)]
+        rows = tables.bottom("gdp_per_capita", 10, year)
+        cache.get_or_build(("gdp-lowest", year), lambda: px.bar(rows, x="gdp_per_capita", y="Entity"))
+        cache.get_or_build(("gdp-highest", year), lambda: energy_figures.render_png(
+            lambda fig: sns.barplot(x="Entity", y="gdp_per_capita", data=rows,
+                                    order=rows["Entity"], ax=fig.subplots()), figsize=(14, 5)))
+
+    # Fill the cache once, so the measurement below sees the steady state
+    for i in range(len(tables.years)):
+        rerun(i)
+    before = rss_mb()
+    start = time.perf_counter()
+    for i in range(reruns):
+        rerun(i)
+    elapsed = (time.perf_counter() - start) * 1000
+    growth = rss_mb() - before
+    stats = cache.stats()
+    report(f"figure cache: {reruns} reruns", elapsed)
+    print(f"{'figure cache: hit rate':<55} {stats['hit_rate'] * 100:10.1f} %")
+    print(f"{'figure cache: cached bytes':<55} {stats['bytes'] / 2**20:10.2f} MB")
+    print(f"{'figure cache: RSS growth':<55} {growth:10.2f} MB")
+
+    before = rss_mb()
+    for i in range(reruns // 10):
+        rows = tables.bottom("gdp_per_capita", 10, tables.years[i % len(tables.years)])
+        plt.figure(figsize=(14, 5))
+        sns.barplot(x="Entity", y="gdp_per_capita", data=rows, order=rows["Entity"])
+    print(f"{f'figure cache: pyplot path RSS growth ({reruns // 10} reruns)':<55} {rss_mb() - before:10.2f} MB")
+    plt.close("all")
+    if growth > max_growth_mb:
+        print(f"figure cache: FAILED, RSS grew by more than {max_growth_mb} MB")
+        return False
+    return True
+
+
+def bench_views(scales):
+    """Every view function in energy_views, first call and cached call.
+
+    The first call includes whatever the view computes on demand (rankings
+    of other metrics, change matrices, correlation statistics); the build of
+    the per-version tables themselves is reported separately.
+    """
+    import energy_correlations
+    import energy_views
+
+    for scale in scales:
+        data = synthetic_energy_data(scale)
+        ms, mb, tables = timed(energy_tables.EnergyTables, data, repeat=1)
+        report(f"views: {scale}x build EnergyTables", ms, mb)
+        correlations = energy_correlations.CorrelationService(tables)
+        year, first = tables.years[-1], tables.years[0]
+        entities = tables.entities[:3].tolist()
+        views = {
+            "gdp_rankings": lambda: energy_views.gdp_rankings(tables, year),
+            "gdp_history": lambda: energy_views.gdp_history(tables, year),
+            "access_rankings": lambda: energy_views.access_rankings(tables, year),
+            "access_correlations": lambda: energy_views.access_correlations(correlations),
+            "geo_correlations": lambda: energy_views.geo_correlations(correlations),
+            "geo_top_emitters": lambda: energy_views.geo_top_emitters(tables),
+            "geo_top_gdp": lambda: energy_views.geo_top_gdp(tables),
+            "low_carbon_ranking": lambda: energy_views.low_carbon_ranking(tables),
+            "emissions_reduction": lambda: energy_views.emissions_reduction(tables, first, year),
+            "entity_trends": lambda: energy_views.entity_trends(tables, entities),
+        }
+        for name, view in views.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            view()
+            first_ms = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            report(f"views: {scale}x {name} first call", first_ms, peak)
+            report(f"views: {scale}x {name} cached", timed(view)[0])
+
+
+def bench_quality(scales, missing=0.05):
+    """The quality stage over synthetic data with `missing` of the values removed.
+
+    Scale 2770 is about 10^7 rows.
+    """
+    import numpy as np
+
+    import energy_quality
+
+    rng = np.random.default_rng(0)
+    for scale in scales:
+        data = synthetic_energy_data(scale)
+        for column in ("Population", "gdp_per_capita", energy_quality.LOW_CARBON, energy_quality.CO2):
+            data.loc[rng.random(len(data)) < missing, column] = np.nan
+        for name, stage in (("derived fills", lambda: energy_quality.derived_fills(data.copy())),
+                            ("interpolation", lambda: energy_quality.interpolate_gaps(data.copy())),
+                            ("robust z-scores", lambda: energy_quality.robust_zscores(data)),
+                            ("full stage", lambda: energy_quality.quality_stage(data))):
+            ms, mb, _ = timed(stage, repeat=1)
+            report(f"quality: {len(data)} rows {name}", ms, mb)
+
+
+def bench_serving(scales):
+    """Overview table serving: summary statistics, sorted pages and what a page sends."""
+    import energy_serving
+
+    for scale in scales:
+        data = synthetic_energy_data(scale)
+        server = energy_serving.TableServer(data)
+        report(f"serving: {len(data)} rows describe()", *timed(data.describe, repeat=1)[:2])
+        report(f"serving: {len(data)} rows summary_statistics", *timed(energy_serving.summary_statistics, data,
+                                                                       repeat=1)[:2])
+        server.summary()
+        report(f"serving: {len(data)} rows summary (cached)", timed(server.summary)[0])
+        report(f"serving: {len(data)} rows sorted page (first call)",
+               timed(server.page, 0, sort_by="gdp_per_capita", ascending=False, repeat=1)[0])
+        ms, _, page = timed(server.page, 100, sort_by="gdp_per_capita", ascending=False,
+                            columns=["Entity", "Year", "gdp_per_capita"])
+        report(f"serving: {len(data)} rows sorted page (cached order)", ms)
+        print(f"{f'serving: {len(data)} rows page sent vs whole frame':<55} "
+              f"{len(page.to_json()) / 2**10:10.1f} KB vs {data.memory_usage(deep=True).sum() / 2**20:.1f} MB")
+
+
+def bench_projections(scales):
+    """Trend fits of every entity, batched against one np.polyfit per entity, and scenario re-evaluation."""
+    import numpy as np
+    import energy_projections
+
+    metric = energy_projections.RENEWABLE_SHARE
+    for scale in scales:
+        tables = energy_tables.EnergyTables(synthetic_energy_data(scale))
+        matrix, years = tables.matrix(metric), np.asarray(tables.years, dtype="float64")
+
+        def polyfit_loop():
+            for values in matrix:
+                present = ~np.isnan(values)
+                if present.sum() > 1:
+                    np.polyfit(years[present], values[present], 1)
+
+        entities = len(tables.entities)
+        report(f"projections: {entities} entities polyfit loop", timed(polyfit_loop, repeat=1)[0])
+        report(f"projections: {entities} entities batched fit",
+               *timed(energy_projections.fit_trends, matrix, years)[:2])
+        engine = energy_projections.ProjectionEngine(tables)
+        engine.fit(metric)
+        selected = list(tables.entities[:5])
+        report(f"projections: {entities} entities scenario, 5 entities",
+               timed(engine.project, metric, selected, adjustment=0.5, repeat=50)[0])
+        report(f"projections: {entities} entities scenario, all entities",
+               timed(engine.project, metric, list(tables.entities), adjustment=0.5, repeat=20)[0])
+
+
+def bench_refresh(scales):
+    """Background refresh: load time of a new version and view latency on the request path meanwhile.
+
+    A refresher serves a copy of Energy_data.csv from a temporary source
+    directory; a `scale` times larger file is dropped in and a view is
+    looked up from `current()` in a loop until the swap happens.
+    """
+    import energy_refresh
+    import energy_views
+
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as source_dir:
+            energy_data.read_energy_csv().to_csv(os.path.join(source_dir, "a.csv"), index=False)
+            refresher = energy_refresh.DatasetRefresher(source_dir=source_dir, interval=0.05).start()
+            old = refresher.current()
+            # Written under another name and renamed in, as a scheduled export would
+            synthetic_energy_data(scale).to_csv(os.path.join(source_dir, "b.tmp"), index=False)
+            os.replace(os.path.join(source_dir, "b.tmp"), os.path.join(source_dir, "b.csv"))
+            refresher.refresh()
+            start = time.perf_counter()
+            latencies = []
+            while refresher.current() is old and time.perf_counter() - start < 600:
+                view_start = time.perf_counter()
+                dataset = refresher.current()
+                energy_views.gdp_rankings(dataset.tables, dataset.tables.years[-1])
+                latencies.append((time.perf_counter() - view_start) * 1000)
+                time.sleep(0.01)
+            report(f"refresh: {scale}x load, validate and swap", (time.perf_counter() - start) * 1000)
+            report(f"refresh: {scale}x view during load (median)", sorted(latencies)[len(latencies) // 2])
+            report(f"refresh: {scale}x view during load (max)", max(latencies))
+
+
+def bench_precompute(scales):
+    """Full artifact regeneration per worker count, and artifact lookup against live compute."""
+    import energy_precompute
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        energy_precompute.precompute(workers=workers, force=True)
+        report(f"precompute: regenerate, {workers} workers", (time.perf_counter() - start) * 1000)
+    artifacts = energy_precompute.read_artifacts()
+    tables = energy_tables.EnergyTables(energy_data.read_energy_data())
+    first, last = tables.years[0], tables.years[-1]
+    for name, key in (("gdp_highest", (last,)), ("access_lowest", (last,)),
+                      ("emissions_reduction", (first, last))):
+        report(f"precompute: {name} live", timed(energy_precompute.lookup, None, tables, name, *key)[0])
+        report(f"precompute: {name} artifact", timed(energy_precompute.lookup, artifacts, tables, name, *key)[0])
+
+
+def bench_reruns(scales):
+    """Full script reruns of every menu and Analysis sub-view through AppTest.
+
+    For Analysis sub-views the compute time recorded by timed_view is
+    reported next to the rerun time.
+    """
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("reruns: streamlit is not installed, skipping")
+        return
+    import energy_profiling
+
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    for menu in _radio(app, "Navigation").options:
+        _radio(app, "Navigation").set_value(menu)
+        ms, _, _ = timed(app.run, repeat=3)
+        report(f"rerun: {menu}", ms)
+    _radio(app, "Navigation").set_value("Analysis")
+    app.run()
+    for category in _radio(app, "Category").options:
+        _radio(app, "Category").set_value(category)
+        app.run()
+        sub_radios = [r for r in app.radio if r.label not in ("Navigation", "Category")]
+        views = [(sub_radios[0].label, view) for view in sub_radios[0].options] if sub_radios else [(None, category)]
+        for label, view in views:
+            if label:
+                _radio(app, label).set_value(view)
+            rerun_ms = view_ms = float("inf")
+            for _ in range(3):
+                energy_profiling.timings.clear()
+                start = time.perf_counter()
+                app.run()
+                rerun_ms = min(rerun_ms, (time.perf_counter() - start) * 1000)
+                view_ms = min(view_ms, sum(energy_profiling.timings.values()))
+            report(f"rerun: Analysis / {category} / {view}", rerun_ms)
+            report("  of which view compute", view_ms)
+
+
+def bench_profiling(scales, spans=100_000):
+    """Cost of one timed_view span with profiling disabled and enabled."""
+    import energy_profiling
+
+    def run_spans():
+        for _ in range(spans):
+            with energy_profiling.timed_view("bench"):
+                pass
+
+    for label, enabled in (("disabled", False), ("enabled", True)):
+        energy_profiling.start_rerun("bench", enabled)
+        start = time.perf_counter()
+        run_spans()
+        elapsed = time.perf_counter() - start
+        energy_profiling.finish_rerun("bench")
+        print(f"{f'profiling: {label}, per span':<55} {elapsed / spans * 1e6:10.2f} us")
+
+
+SECTIONS = {
+    "load": bench_load,
+    "columnar": bench_columnar,
+    "tables": bench_tables,
+    "changes": bench_changes,
+    "series": bench_series,
+    "correlations": bench_correlations,
+    "choropleth": bench_choropleth,
+    "lod": bench_lod,
+    "figure_cache": bench_figure_cache,
+    "views": bench_views,
+    "quality": bench_quality,
+    "serving": bench_serving,
+    "projections": bench_projections,
+    "refresh": bench_refresh,
+    "precompute": bench_precompute,
+    "reruns": bench_reruns,
+    "profiling": bench_profiling,
+    "startup": bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sections", nargs="*", metavar="section",
+                        help=f"one of {', '.join(SECTIONS)} (default: all)")
+    parser.add_argument("--scales", nargs="+", type=int, default=SCALES,
+                        help="dataset sizes, as multiples of Energy_data.csv")
+    args = parser.parse_args(argv)
+    unknown = set(args.sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+    os.chdir(os.path.dirname(APP_PATH))
+    failed = [name for name in args.sections or SECTIONS if SECTIONS[name](args.scales) is False]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Figure builders for the heavier Analysis charts.
+
+The builders only take the columns a chart needs, so the figure JSON sent to
+the browser doesn't grow with unrelated columns. Caching is left to the app.
+
+Scatter plots have a level-of-detail mode for data past country level:
+
+- `scatter` switches to WebGL (scattergl) above WEBGL_THRESHOLD points.
+  SVG draws one DOM node per point and stalls the browser at a few
+  thousand; WebGL stays interactive into the hundreds of thousands. The
+  payload is the same either way (x/y ship as binary arrays).
+- Plotly has no WebGL scatter_geo, so `geo_scatter` bounds the payload
+  instead: above GEO_POINT_BUDGET points `grid_aggregate` bins lat/lon into
+  at most that many grid cells on the server. Passing the visible extent
+  re-bins only the points inside it, so zooming in gives a finer grid.
+
+Figure JSON measured with `python benchmark.py lod` (Energy_data.csv
+repeated, coordinates jittered by up to 3 degrees):
+
+    points     scatter            geo_scatter raw    binned (world / Europe)
+    172        9 KB (svg)         16 KB              16 KB / 9 KB
+    17,200     192 KB (webgl)     919 KB             87 KB / 168 KB
+    172,000    1.8 MB (webgl)     9.1 MB             94 KB / 80 KB
+
+The two charts first drawn with seaborn (highest GDP bars, access scatter
+of GDP against population) are drawn with Plotly by default, so pages
+never import matplotlib; ENERGY_CHART_BACKEND=seaborn brings the seaborn
+PNGs back.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import energy_imports
+
+px = energy_imports.lazy_import("plotly.express")
+
+# Above this many points `scatter` renders with WebGL instead of SVG
+WEBGL_THRESHOLD = 1_000
+# At most this many markers are sent by `geo_scatter`
+GEO_POINT_BUDGET = 2_000
+WORLD = ((-90, 90), (-180, 180))
+CHART_BACKEND_ENV = "ENERGY_CHART_BACKEND"
+CHART_BACKENDS = ("plotly", "seaborn")
+
+RENEWABLE_SHARE = "Renewable energy share in the total final energy consumption (%)"
+CHOROPLETH_HOVER = ["Year", "Land Area(Km2)", "Density", "gdp_per_capita"]
+CHOROPLETH_COLUMNS = ["Entity", "Year", RENEWABLE_SHARE, "Land Area(Km2)", "Density", "gdp_per_capita"]
+
+
+def chart_backend():
+    """Return the library the former seaborn charts are drawn with, from $ENERGY_CHART_BACKEND."""
+    backend = os.environ.get(CHART_BACKEND_ENV, CHART_BACKENDS[0]).strip().lower()
+    if backend not in CHART_BACKENDS:
+        raise ValueError(f"{CHART_BACKEND_ENV} must be one of {', '.join(CHART_BACKENDS)}, not {backend!r}")
+    return backend
+
+
+def renewable_choropleth(data, animate=True):
+    """Build the renewable share choropleth from `data`.
+
+    With `animate` every year in `data` becomes an animation frame. Otherwise
+    `data` is expected to hold one year (see EnergyTables.year) and a single
+    map is built. The color range is fixed to 0-100 % so maps of different
+    years share one scale.
+    """
+    metrics = CHOROPLETH_COLUMNS[2:]
+    data = data[CHOROPLETH_COLUMNS].astype({column: "float32" for column in metrics})
+    if animate:
+        title = 'Renewable Energy Share by Country Over Years'
+    else:
+        title = f'Renewable Energy Share by Country in {int(data["Year"].iloc[0])}'
+    return px.choropleth(data,
+                         locations='Entity',
+                         locationmode='country names',
+                         color=RENEWABLE_SHARE,
+                         hover_name='Entity',
+                         hover_data=CHOROPLETH_HOVER,
+                         range_color=(0, 100),
+                         title=title,
+                         animation_frame="Year" if animate else None)
+
+
+def scatter(data, x, y, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """px.scatter that renders with WebGL once `data` has more than `webgl_threshold` points."""
+    render_mode = "webgl" if len(data) > webgl_threshold else "svg"
+    return px.scatter(data, x=x, y=y, render_mode=render_mode, **kwargs)
+
+
+def grid_aggregate(data, budget=GEO_POINT_BUDGET, extent=WORLD, sums=(), means=(), rank_by=None):
+    """Bin the Latitude/Longitude points of `data` into at most `budget` grid cells.
+
+    Only points inside `extent` ((lat_min, lat_max), (lon_min, lon_max)) are
+    kept. The grid starts fine and doubles its cell size until the occupied
+    cells fit the budget; with `budget` or fewer points the rows are returned
+    unbinned. Each cell is placed at the centroid of its points, `sums`
+    columns are added up, `means` columns averaged (both skipping NaN), and
+    the cell is labelled with the Entity ranked highest by `rank_by` (the
+    first point otherwise) plus the count of other points.
+
+    Returns (frame, cell size in degrees or None when nothing was binned).
+    """
+    (lat_min, lat_max), (lon_min, lon_max) = extent
+    lat = data["Latitude"].to_numpy(dtype="float64")
+    lon = data["Longitude"].to_numpy(dtype="float64")
+    inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    data, lat, lon = data[inside], lat[inside], lon[inside]
+    if len(data) <= budget:
+        return data.assign(points=1), None
+
+    # Start at a quarter of the cell size whose full grid would fit the budget
+    cell = np.sqrt(max(lat_max - lat_min, 1e-9) * max(lon_max - lon_min, 1e-9) / budget) / 4
+    while True:
+        rows = np.floor((lat - lat_min) / cell).astype("int64")
+        cols = np.floor((lon - lon_min) / cell).astype("int64")
+        cells, keys = pd.factorize(rows * (cols.max() + 1) + cols)
+        if len(keys) <= budget:
+            break
+        cell *= 2
+
+    n = len(keys)
+    count = np.bincount(cells, minlength=n)
+    frame = {"Latitude": np.bincount(cells, lat, n) / count,
+             "Longitude": np.bincount(cells, lon, n) / count}
+    for column in (*sums, *means):
+        values = data[column].to_numpy(dtype="float64")
+        present = ~np.isnan(values)
+        total = np.bincount(cells, np.where(present, values, 0.0), n)
+        present_count = np.bincount(cells, present, n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame[column] = np.where(present_count > 0,
+                                     total if column in sums else total / present_count, np.nan)
+
+    # Label each cell with its top-ranked point: sort by cell, then rank within the cell
+    if rank_by is None:
+        order = np.argsort(cells, kind="stable")
+    else:
+        order = np.lexsort((-np.nan_to_num(data[rank_by].to_numpy(dtype="float64"), nan=-np.inf), cells))
+    first = order[np.r_[0, np.flatnonzero(np.diff(cells[order])) + 1]]
+    # `first` is in cell order, so its labels line up with the cells
+    label = pd.Series(data["Entity"].astype(str).to_numpy()[first])
+    others = pd.Series(count - 1)
+    frame["Entity"] = label.where(others == 0, label + " +" + others.astype(str)).to_numpy()
+    frame["points"] = count
+    return pd.DataFrame(frame), cell
+
+
+def geo_scatter(data, size, color, hover_data, budget=GEO_POINT_BUDGET, extent=WORLD,
+                sums=(), means=(), **kwargs):
+    """px.scatter_geo of `data` with at most `budget` markers inside `extent`.
+
+    Points are binned with `grid_aggregate` (ranked by `color`) when there
+    are more than `budget` of them; the map is zoomed to `extent`.
+    """
+    points, cell = grid_aggregate(data, budget, extent, sums, means, rank_by=color)
+    if cell is not None:
+        kwargs["title"] = f"{kwargs.get('title', 'Points')} ({len(points)} cells of {cell:.2g}°)"
+        hover_data = [*hover_data, "points"]
+    fig = px.scatter_geo(points, lat="Latitude", lon="Longitude", size=size, color=color,
+                         hover_name="Entity", hover_data=hover_data, **kwargs)
+    if extent != WORLD:
+        (lat_min, lat_max), (lon_min, lon_max) = extent
+        fig.update_geos(lataxis_range=[lat_min, lat_max], lonaxis_range=[lon_min, lon_max])
+    return fig
@@ -0,0 +1,131 @@
+"""Correlation matrices from running sufficient statistics.
+
+CorrelationStats keeps, for every pair of columns, the count, sums, sums of
+squares and cross-products over the rows where both values are present.
+That is enough to produce the same pairwise-complete Pearson matrix as
+DataFrame.corr() in O(k^2), and two sets of statistics over disjoint rows
+simply add up. CorrelationService keeps one set per year so whole-dataset,
+per-year and appended data are served without rescanning rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+class CorrelationStats:
+    """Pairwise sufficient statistics for Pearson correlation of `columns`.
+
+    Values are shifted by `shift` before accumulating, which keeps the sums
+    small and the result numerically close to DataFrame.corr(). Statistics
+    can only be added together when they share the same shift.
+    """
+
+    def __init__(self, columns, shift):
+        k = len(columns)
+        self.columns = list(columns)
+        self.shift = np.asarray(shift, dtype="float64")
+        self.count = np.zeros((k, k))
+        self.sums = np.zeros((k, k))      # sums[i, j]: sum of column i where i and j are present
+        self.squares = np.zeros((k, k))   # squares[i, j]: same for the squared values
+        self.products = np.zeros((k, k))  # products[i, j]: sum of column i * column j
+
+    @classmethod
+    def from_frame(cls, frame, columns, shift=None):
+        """Build statistics over `frame`; `shift` defaults to the column means."""
+        if shift is None:
+            shift = np.nan_to_num(frame[list(columns)].mean().to_numpy(dtype="float64"))
+        return cls(columns, shift).update(frame)
+
+    def update(self, frame):
+        """Add the rows of `frame` to the statistics and return self."""
+        values = frame[self.columns].to_numpy(dtype="float64") - self.shift
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        present = present.astype("float64")
+        self.count += present.T @ present
+        self.sums += values.T @ present
+        self.squares += (values * values).T @ present
+        self.products += values.T @ values
+        return self
+
+    def __add__(self, other):
+        if self.columns != other.columns or not np.array_equal(self.shift, other.shift):
+            raise ValueError("can only add statistics over the same columns and shift")
+        total = CorrelationStats(self.columns, self.shift)
+        for name in ("count", "sums", "squares", "products"):
+            setattr(total, name, getattr(self, name) + getattr(other, name))
+        return total
+
+    def corr(self):
+        """Return the pairwise-complete Pearson correlation matrix."""
+        n, sums = self.count, self.sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = n * self.products - sums * sums.T
+            variance = n * self.squares - sums * sums
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr[n < 1] = np.nan
+        corr = np.clip(corr, -1, 1)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class CorrelationService:
+    """Cached correlation matrices for one version of the data.
+
+    Statistics are kept per column set and year. The whole dataset is the
+    sum of its years and a year is read directly. An entity subset (in one
+    year or all) reads just its entities' rows through EnergyTables.series,
+    one slice per entity, so its cost depends on the size of the subset and
+    not of the data, and nothing is cached per subset. `append` adds new
+    rows to all of these without touching the rows already counted.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._shifts = {}      # columns -> shift shared by all their statistics
+        self._by_year = {}     # columns -> {year: CorrelationStats}
+        self._appended = []    # rows added through append()
+
+    def _empty(self, columns):
+        if columns not in self._shifts:
+            means = self.tables.data[list(columns)].mean().to_numpy(dtype="float64")
+            self._shifts[columns] = np.nan_to_num(means)
+        return CorrelationStats(columns, self._shifts[columns])
+
+    def _year_stats(self, columns):
+        if columns not in self._by_year:
+            by_year = {year: self._empty(columns).update(self.tables.year(year)) for year in self.tables.years}
+            # A column set first asked for after append() still counts the appended rows
+            for rows in self._appended:
+                for year, year_rows in rows.groupby("Year"):
+                    by_year.setdefault(int(year), self._empty(columns)).update(year_rows)
+            self._by_year[columns] = by_year
+        return self._by_year[columns]
+
+    def _subset_stats(self, columns, entities, year=None):
+        entities = list(dict.fromkeys(entities))
+        series = self.tables.series(entities, ["Year", *columns])
+        stats = self._empty(columns).update(series if year is None else series[series["Year"] == year])
+        for appended in self._appended:
+            appended = appended[appended["Entity"].isin(entities)]
+            stats.update(appended if year is None else appended[appended["Year"] == year])
+        return stats
+
+    def stats(self, columns, year=None, entities=None):
+        """Return the statistics for `columns`, optionally for one year, an entity subset or both."""
+        columns = tuple(columns)
+        if entities is not None:
+            return self._subset_stats(columns, entities, year)
+        by_year = self._year_stats(columns)
+        if year is not None:
+            return by_year.get(year, self._empty(columns))
+        return sum(by_year.values(), self._empty(columns))
+
+    def corr(self, columns, year=None, entities=None):
+        """Return the correlation matrix of `columns` (see `stats` for the subsets)."""
+        return self.stats(columns, year, entities).corr()
+
+    def append(self, rows):
+        """Add new rows (e.g. a new year) to every cached set of statistics."""
+        self._appended.append(rows)
+        for columns, by_year in self._by_year.items():
+            for year, year_rows in rows.groupby("Year"):
+                by_year.setdefault(int(year), self._empty(columns)).update(year_rows)
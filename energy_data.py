@@ -0,0 +1,161 @@
+"""Data loading for the Sustainable-Energy app.
+
+Everything here is plain pandas so it can be used from the Streamlit script,
+from the command line and from the benchmark script alike. Streamlit caching
+is applied by the app on top of these functions.
+"""
+import contextlib
+import functools
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (needed by pandas for Parquet)
+except ImportError:
+    pyarrow = None
+
+DATA_PATH = "Energy_data.csv"
+CACHE_DIR = ".energy_cache"
+
+# Metric columns, in the same order as the CSV
+METRIC_COLUMNS = [
+    "Access to electricity (% of population)",
+    "Access to clean fuels for cooking",
+    "Renewable-electricity_Watt/capita",
+    "Renewable energy share in the total final energy consumption (%)",
+    "Electricity from fossil fuels (TWh)",
+    "Electricity from nuclear (TWh)",
+    "Electricity from renewables (TWh)",
+    "Low-carbon electricity (% electricity)",
+    "Primary energy consumption per capita (kWh/person)",
+    "Energy intensity level of primary energy (MJ/$2017 PPP GDP)",
+    "Value_co2_emissions_kt_by_country",
+    "Renewables (% equivalent primary energy)",
+    "gdp_growth",
+    "gdp_per_capita",
+    "Density",
+    "Land Area(Km2)",
+    "Latitude",
+    "Longitude",
+    "Population",
+]
+
+# Explicit dtype schema, so read_csv doesn't have to infer types on each load
+SCHEMA = {"Entity": "category", "Year": "int16"}
+SCHEMA.update({column: "float32" for column in METRIC_COLUMNS})
+
+
+@functools.lru_cache(maxsize=8)
+def _file_digest(path, mtime_ns, size):
+    # mtime_ns and size are only part of the key: the digest is recomputed
+    # whenever the file is touched, and reused otherwise.
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_version(path=DATA_PATH):
+    """Return a version stamp for `path` built from its mtime and content hash."""
+    stat = os.stat(path)
+    digest = _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    return f"{stat.st_mtime_ns}-{digest[:12]}"
+
+
+def read_energy_csv(path=DATA_PATH, columns=None):
+    """Read the energy CSV with the typed schema."""
+    dtype = SCHEMA if columns is None else {c: SCHEMA[c] for c in columns if c in SCHEMA}
+    return pd.read_csv(path, dtype=dtype, usecols=columns)
+
+
+def columnar_cache_path(path=DATA_PATH, version=None):
+    """Return the Parquet cache file for `path` at `version`."""
+    version = version or dataset_version(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    return os.path.join(cache_dir, f"{stem}.{version}.parquet")
+
+
+def convert_to_columnar(path=DATA_PATH, version=None):
+    """Convert `path` to a Parquet cache file once and return the cache path.
+
+    The cache file name carries the source version, so editing the CSV
+    makes the old file unreachable. Nothing is removed here: a version may
+    still be served while its successor is converted and validated, so the
+    caller drops old versions with `remove_columnar_cache` once it is safe.
+    Raises ValueError when `version` is no longer the version on disk,
+    rather than caching the newer file under the old version's name.
+    """
+    cache_path = columnar_cache_path(path, version)
+    if os.path.exists(cache_path):
+        return cache_path
+    if version is not None and dataset_version(path) != version:
+        raise ValueError(f"{os.path.basename(path)} changed on disk since version {version}")
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary name first so readers never see a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    read_energy_csv(path).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def remove_columnar_cache(path=DATA_PATH, version="*", keep=None):
+    """Remove the cache files of `path` at `version` (every version by default), except those of `keep`.
+
+    This covers the columnar cache and everything stored next to it under
+    the same version, such as the quality stage output.
+    """
+    pattern = columnar_cache_path(path, version).replace(".parquet", "*.parquet")
+    kept = os.path.basename(columnar_cache_path(path, keep))[:-len("parquet")] if keep else None
+    for stale in glob.glob(pattern):
+        if kept and os.path.basename(stale).startswith(kept):
+            continue
+        # Files still memory-mapped elsewhere can't be removed on some platforms
+        with contextlib.suppress(OSError):
+            os.remove(stale)
+
+
+def read_energy_data(path=DATA_PATH, columns=None, version=None):
+    """Read the energy data, optionally restricted to `columns`.
+
+    The CSV is converted to a memory-mapped Parquet cache on first use, so
+    later loads skip text parsing and only read the requested columns. Falls
+    back to the CSV when pyarrow is not installed or the cache directory is
+    not writable.
+    """
+    columns = list(columns) if columns is not None else None
+    if pyarrow is None:
+        return read_energy_csv(path, columns)
+    try:
+        cache_path = convert_to_columnar(path, version)
+    except OSError:
+        return read_energy_csv(path, columns)
+    return pd.read_parquet(cache_path, columns=columns, memory_map=True)
+
+
+def validate_energy_data(data):
+    """Raise ValueError unless `data` looks like a complete energy dataset.
+
+    Checks that every schema column is present, that there are rows, that
+    every row has an Entity and a Year, and that no (Entity, Year) pair
+    appears twice.
+    """
+    missing = [column for column in SCHEMA if column not in data]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    if data.empty:
+        raise ValueError("no rows")
+    # A blank key would be indexed as entity or year -1 by EnergyTables,
+    # i.e. as the last entity, showing its values under another name
+    for key in ("Entity", "Year"):
+        blank = data[key].isna()
+        if blank.any():
+            raise ValueError(f"{int(blank.sum())} rows without {key}, e.g. row {int(blank.to_numpy().argmax())}")
+    duplicated = data.duplicated(["Entity", "Year"])
+    if duplicated.any():
+        first = data[duplicated].iloc[0]
+        raise ValueError(f"{int(duplicated.sum())} duplicated Entity/Year rows, e.g. {first['Entity']} {first['Year']}")
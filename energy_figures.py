@@ -0,0 +1,93 @@
+"""Shared cache for built figures.
+
+Building a Plotly or seaborn figure costs far more than looking one up, and
+the same figure is asked for again on every rerun of every session. The app
+keeps one FigureCache per process, keyed on (view id, parameters, dataset
+version), and evicts least recently used figures past an entry or byte
+budget.
+
+Matplotlib figures are rendered to PNG bytes through `render_png`, which
+draws on a standalone Figure: nothing goes through pyplot's global state,
+so nothing accumulates across reruns. Matplotlib itself is only imported
+on the first render.
+"""
+import io
+import sys
+import threading
+from collections import OrderedDict
+
+import energy_imports
+
+matplotlib_figure = energy_imports.lazy_import("matplotlib.figure")
+
+
+def render_png(draw, figsize=(6.4, 4.8), dpi=200):
+    """Call `draw(fig)` on a new standalone Figure and return it as PNG bytes."""
+    fig = matplotlib_figure.Figure(figsize=figsize, dpi=dpi)
+    try:
+        draw(fig)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        # A Figure created without pyplot is not registered anywhere; clearing
+        # it drops the artists right away instead of waiting for the GC
+        fig.clear()
+
+
+def figure_size(value):
+    """Estimate the memory held by a cached figure, in bytes."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "to_json"):
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+class FigureCache:
+    """Thread-safe LRU cache of figures with entry and byte limits."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (figure, size)
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        """Return the figure cached under `key`, calling `build()` on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        # Build outside the lock so one slow figure doesn't block other sessions
+        figure = build()
+        size = figure_size(figure)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self.size += size
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return hit/miss counters, hit rate and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.size,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
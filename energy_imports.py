@@ -0,0 +1,54 @@
+"""Deferred imports of the heavy plotting libraries.
+
+A new worker runs the whole script before its first page is shown, so
+every module imported at the top of the script is paid for on cold start,
+whichever page is asked for. Seaborn (which pulls in matplotlib) and
+plotly.express are only needed by the views that draw with them, so they
+are imported through `lazy_import`: the name is bound at the top as usual
+and the module is imported on its first attribute access. With profiling
+on, that import shows up as an "import <module>" span of the rerun that
+paid for it.
+
+DEFERRED_MODULES lists what the landing page must not import; `benchmark.py
+startup` fails when one of them is imported by the script's imports.
+"""
+import importlib
+import sys
+import threading
+
+import energy_profiling
+
+DEFERRED_MODULES = ("seaborn", "matplotlib", "plotly.express")
+
+
+class LazyModule:
+    """Stands in for module `name` and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self.__name__ = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                profile = energy_profiling.current_profile()
+                if profile is None or self.__name__ in sys.modules:
+                    self._module = importlib.import_module(self.__name__)
+                else:
+                    with profile.span(f"import {self.__name__}"):
+                        self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set in __init__, i.e. the module's
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        state = "imported" if self._module is not None else "not imported yet"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """Return module `name` if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
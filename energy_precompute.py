@@ -0,0 +1,214 @@
+"""Offline precompute of the Analysis view tables.
+
+Usage:
+    python energy_precompute.py [--data Energy_data.csv] [--workers N] [--force]
+
+Every ranking and delta table the Analysis views show is computed over a
+process pool, one task per artifact and year, and written as versioned
+Parquet artifacts:
+
+    .energy_cache/artifacts/<dataset version>/<artifact>.parquet
+    .energy_cache/artifacts/<dataset version>/manifest.json
+
+The app reads them through `read_artifacts` and `lookup`, and computes a
+table itself only when no artifacts exist for the current dataset version.
+Each worker builds its own EnergyTables from the cached quality stage
+output, so a refresh costs one table build per worker plus 1/N of the views.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+import energy_data
+import energy_quality
+import energy_tables
+import energy_views
+
+ARTIFACT_DIR = "artifacts"
+MANIFEST = "manifest.json"
+
+# Artifact name -> (function of (tables, *key), names of the key parts).
+# Tables keyed by year are computed one task per year; the emission deltas
+# one task per start year, covering every end year from it on.
+ARTIFACTS = {
+    "gdp_highest": (lambda tables, year: energy_views.gdp_rankings(tables, year)[0], ("year",)),
+    "gdp_lowest": (lambda tables, year: energy_views.gdp_rankings(tables, year)[1], ("year",)),
+    "access_lowest": (lambda tables, year: energy_views.access_rankings(tables, year)[0], ("year",)),
+    "access_highest": (lambda tables, year: energy_views.access_rankings(tables, year)[1], ("year",)),
+    "geo_top_emitters": (energy_views.geo_top_emitters, ()),
+    "geo_top_gdp": (energy_views.geo_top_gdp, ()),
+    "low_carbon_ranking": (energy_views.low_carbon_ranking, ()),
+    "emissions_reduction": (energy_views.emissions_reduction, ("start", "end")),
+}
+
+# EnergyTables of the worker process, built once by _init_worker
+_tables = None
+
+
+def artifact_dir(path=energy_data.DATA_PATH, version=None):
+    """Return the artifact directory for `path` at `version`."""
+    version = version or energy_data.dataset_version(path)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), energy_data.CACHE_DIR)
+    return os.path.join(cache_dir, ARTIFACT_DIR, version)
+
+
+def tasks(tables):
+    """Return the (artifact, key prefix) tasks covering every artifact of `tables`."""
+    for name, (_, key_names) in ARTIFACTS.items():
+        if not key_names:
+            yield name, ()
+        else:
+            for year in tables.years:
+                yield name, (year,)
+
+
+def compute(tables, name, prefix):
+    """Compute the tables of artifact `name` for every key starting with `prefix`.
+
+    Returns a list of (key, frame).
+    """
+    function, key_names = ARTIFACTS[name]
+    if len(key_names) == 2:
+        keys = [(*prefix, end) for end in tables.years if end >= prefix[0]]
+    else:
+        keys = [prefix]
+    return [(key, function(tables, *key)) for key in keys]
+
+
+def _init_worker(path, version):
+    global _tables
+    _tables = energy_tables.EnergyTables(energy_quality.read_quality_data(path, version=version))
+
+
+def _run_task(name, prefix):
+    return name, compute(_tables, name, prefix)
+
+
+def _combine(name, results):
+    """Stack the (key, frame) results of one artifact into a single frame with key columns."""
+    _, key_names = ARTIFACTS[name]
+    # Unnamed indexes (row labels of the source frame) are kept as "_index"
+    index_name = results[0][1].index.name or "_index"
+    frames = []
+    for key, frame in results:
+        frame = frame.rename_axis(index_name).reset_index()
+        frames.append(frame.assign(**{f"_key_{k}": v for k, v in zip(key_names, key)}))
+    return pd.concat(frames, ignore_index=True), index_name
+
+
+def precompute(path=energy_data.DATA_PATH, workers=None, force=False):
+    """Compute every artifact of `path` over a process pool and write them.
+
+    The artifacts are written to a temporary directory that is renamed into
+    place, so the app sees either all of a version's artifacts or none.
+    Directories of older versions are removed. Returns the artifact directory.
+    """
+    if energy_data.pyarrow is None:
+        raise RuntimeError("writing artifacts needs pyarrow")
+    version = energy_data.dataset_version(path)
+    target = artifact_dir(path, version)
+    if os.path.exists(os.path.join(target, MANIFEST)) and not force:
+        return target
+    # Run the quality stage once here, so the workers only read its cached output
+    task_list = list(tasks(energy_tables.EnergyTables(
+        energy_quality.read_quality_data(path, ["Entity", "Year"], version))))
+
+    results = {name: [] for name in ARTIFACTS}
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                initargs=(path, version)) as pool:
+        futures = [pool.submit(_run_task, name, prefix) for name, prefix in task_list]
+        for future in concurrent.futures.as_completed(futures):
+            name, computed = future.result()
+            results[name].extend(computed)
+
+    tmp_dir = f"{target}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir)
+    manifest = {"version": version, "source": os.path.basename(path), "created": time.time(), "artifacts": {}}
+    for name, computed in results.items():
+        frame, index_name = _combine(name, sorted(computed, key=lambda item: item[0]))
+        frame.to_parquet(os.path.join(tmp_dir, f"{name}.parquet"), index=False)
+        manifest["artifacts"][name] = {"keys": list(ARTIFACTS[name][1]), "index": index_name,
+                                       "tables": len(computed), "rows": len(frame)}
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.rename(tmp_dir, target)
+    for stale in glob.glob(os.path.join(os.path.dirname(target), "*")):
+        if stale != target and not stale.endswith(".tmp"):
+            with contextlib.suppress(FileNotFoundError):
+                shutil.rmtree(stale)
+    return target
+
+
+class Artifacts:
+    """Precomputed view tables of one dataset version, looked up by artifact and key."""
+
+    def __init__(self, manifest, frames):
+        self.version = manifest["version"]
+        self.manifest = manifest
+        self._tables = {}    # artifact -> {key: frame}
+        self._empty = {}     # artifact -> frame with no rows, for keys without rows
+        for name, frame in frames.items():
+            info = manifest["artifacts"][name]
+            key_columns = [f"_key_{k}" for k in info["keys"]]
+            self._empty[name] = self._restore(frame.iloc[:0], key_columns, info["index"])
+            groups = frame.groupby(key_columns, sort=False) if key_columns else [((), frame)]
+            self._tables[name] = {tuple(int(k) for k in key): self._restore(rows, key_columns, info["index"])
+                                  for key, rows in groups}
+
+    @staticmethod
+    def _restore(rows, key_columns, index_name):
+        rows = rows.drop(columns=key_columns).set_index(index_name)
+        return rows.rename_axis(None) if index_name == "_index" else rows
+
+    def __contains__(self, name):
+        return name in self._tables
+
+    def get(self, name, *key):
+        """Return the table of artifact `name` for `key` (no rows when the key has none)."""
+        return self._tables[name].get(tuple(key), self._empty[name])
+
+
+def read_artifacts(path=energy_data.DATA_PATH, version=None):
+    """Read the artifacts of `path` at `version`, or return None when there are none."""
+    directory = artifact_dir(path, version)
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        frames = {name: pd.read_parquet(os.path.join(directory, f"{name}.parquet"))
+                  for name in manifest["artifacts"] if name in ARTIFACTS}
+    except (OSError, ImportError, ValueError):
+        return None
+    return Artifacts(manifest, frames)
+
+
+def lookup(artifacts, tables, name, *key):
+    """Return the table of artifact `name` for `key`, computing it from `tables` without artifacts."""
+    if artifacts is not None and name in artifacts:
+        return artifacts.get(name, *key)
+    return ARTIFACTS[name][0](tables, *key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=energy_data.DATA_PATH, help="energy CSV to precompute")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="recompute even when artifacts exist")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    target = precompute(args.data, args.workers, args.force)
+    print(f"artifacts for {os.path.basename(target)} in {target} ({time.perf_counter() - start:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Timing and memory profiling of the app's views.
+
+`timed_view` wraps the code of one view and records how long it took to
+compute. Timings are logged and kept in `timings` so the benchmark script
+(and anything else in the same process) can read them back.
+
+When profiling is enabled for a rerun (ENERGY_PROFILE=1 or ?profile=1),
+`start_rerun` attaches a RerunProfile to the current thread. Every
+`timed_view` then also records a span with its tracemalloc peak, the app
+records figure payload sizes, and `finish_rerun` returns the profile as one
+JSON-serializable record. Without an active profile `timed_view` costs two
+perf_counter calls and a log call.
+
+tracemalloc is process-wide: it is started by the first open profile and
+stopped when the last one closes, counted across sessions. Streamlit
+interrupts a rerun by raising out of the script when a widget changes, so
+`finish_rerun` is not always reached. `start_rerun` closes the thread's
+interrupted profile, and any profile left open for STALE_PROFILE_SECONDS
+(a session that went away mid-rerun), so tracing never stays on.
+Peaks are process-wide too: while profiles of several sessions overlap,
+each resets the peak the others read, so their memory peaks are reported
+as None and the record is marked "overlapped". Timings are unaffected.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger("sustainable_energy")
+
+# View name -> compute time of its last run, in milliseconds
+timings = {}
+
+PROFILE_ENV = "ENERGY_PROFILE"
+PROFILE_LOG_ENV = "ENERGY_PROFILE_LOG"
+
+# Profiles open longer than this are closed by the next start_rerun
+STALE_PROFILE_SECONDS = 600
+
+# Streamlit runs each session's reruns on its own thread
+_local = threading.local()
+
+# Open profiles of all threads; tracemalloc runs while there are any
+_open = set()
+_open_lock = threading.Lock()
+_owns_tracing = False  # whether tracing was started here rather than by the caller
+
+
+def profiling_enabled(query_value=None):
+    """Return True when the environment or the ?profile= query value turns profiling on."""
+    values = (os.environ.get(PROFILE_ENV, ""), query_value or "")
+    return any(value.lower() in ("1", "true", "yes", "on") for value in values)
+
+
+class RerunProfile:
+    """Spans and figure payloads recorded during one rerun."""
+
+    def __init__(self, session):
+        self.session = session
+        self.started = time.time()
+        self.spans = []
+        self.payloads = []
+        self._stack = []
+        self._start = time.perf_counter()
+        self.overlapped = False
+        self.closed = False
+        _open_profile(self)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Record wall time and tracemalloc peak of the `with` block as `name`."""
+        current, peak = tracemalloc.get_traced_memory()
+        frame = {"start": current, "child_peak": peak}
+        # reset_peak lets this span see its own peak; the parent's peak is
+        # restored from child_peak when this span ends
+        self._stack.append(frame)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._stack.pop()
+            absolute_peak = tracemalloc.get_traced_memory()[1]
+            if self._stack:
+                parent = self._stack[-1]
+                parent["child_peak"] = max(parent["child_peak"], absolute_peak)
+            self.spans.append({"name": name, "ms": round(elapsed, 3),
+                               "peak_kb": None if self.overlapped or self.closed else
+                               round(max(absolute_peak - frame["start"], 0) / 1024, 1)})
+
+    def record_payload(self, view, size):
+        """Record the serialized size of a figure sent for `view`, in bytes."""
+        self.payloads.append({"view": view, "bytes": int(size)})
+
+    def finish(self, page):
+        """Close the profile and return its record."""
+        total = (time.perf_counter() - self._start) * 1000
+        peak = tracemalloc.get_traced_memory()[1]
+        self.close()
+        return {"session": self.session, "time": self.started, "page": page,
+                "total_ms": round(total, 3), "peak_kb": None if self.overlapped else round(peak / 1024, 1),
+                "overlapped": self.overlapped, "spans": self.spans, "payloads": self.payloads,
+                "payload_bytes": sum(payload["bytes"] for payload in self.payloads)}
+
+    def close(self):
+        """Stop counting this profile towards tracemalloc; safe to call more than once."""
+        _close_profile(self)
+
+
+def _open_profile(profile):
+    global _owns_tracing
+    with _open_lock:
+        if not _open and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        _open.add(profile)
+        if len(_open) > 1:
+            for other in _open:
+                other.overlapped = True
+
+
+def _close_profile(profile):
+    global _owns_tracing
+    with _open_lock:
+        if profile.closed:
+            return
+        profile.closed = True
+        _open.discard(profile)
+        if not _open and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+def start_rerun(session, enabled):
+    """Start profiling this thread's rerun when `enabled`; return the profile or None.
+
+    A profile the thread's previous rerun left open (it was interrupted
+    before `finish_rerun`) is closed first, as are profiles of any thread
+    open for more than STALE_PROFILE_SECONDS.
+    """
+    stale = getattr(_local, "profile", None)
+    if stale is not None:
+        stale.close()
+    with _open_lock:
+        expired = [p for p in _open if time.time() - p.started > STALE_PROFILE_SECONDS]
+    for profile in expired:
+        profile.close()
+    _local.profile = RerunProfile(session) if enabled else None
+    return _local.profile
+
+
+def current_profile():
+    """Return the RerunProfile of this thread's rerun, or None when not profiling."""
+    return getattr(_local, "profile", None)
+
+
+def finish_rerun(page):
+    """Close this thread's profile and return its record (None when not profiling).
+
+    The record is also appended as one JSON line to $ENERGY_PROFILE_LOG when
+    that is set, so records can be aggregated across sessions and workers.
+    """
+    profile = current_profile()
+    if profile is None:
+        return None
+    _local.profile = None
+    record = profile.finish(page)
+    log_path = os.environ.get(PROFILE_LOG_ENV)
+    if log_path:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return record
+
+
+@contextlib.contextmanager
+def timed_view(name):
+    """Time the body of the `with` block as the view `name`."""
+    profile = current_profile()
+    span = profile.span(name) if profile is not None else contextlib.nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[name] = elapsed
+        logger.info("view %r computed in %.1f ms", name, elapsed)
@@ -0,0 +1,140 @@
+"""Per-entity trend projections under adjustable growth scenarios.
+
+Trends are fitted for every entity at once: the (entity x year) matrix of a
+metric becomes one weighted least-squares problem per entity, and the
+normal equations of all entities are stacked into a single batched
+np.linalg.solve. Missing years get zero weight. The fitted coefficients are
+kept per metric, so moving a scenario slider only re-evaluates the
+projection, which is a few array operations over entities x future years.
+
+Projections start from each entity's last observed value and follow the
+fitted trend from there, plus the scenario adjustment:
+
+- linear metrics (shares): + `adjustment` percentage points per year,
+  clipped to the metric's bounds;
+- log-linear metrics (emissions): x (1 + `adjustment` %) per year.
+"""
+import numpy as np
+import pandas as pd
+
+RENEWABLE_SHARE = "Renewable energy share in the total final energy consumption (%)"
+CO2 = "Value_co2_emissions_kt_by_country"
+HORIZON = 2030
+
+# Metric -> (trend fitted on log values, bounds of the projected values)
+MODELS = {
+    RENEWABLE_SHARE: (False, (0, 100)),
+    CO2: (True, (0, None)),
+}
+
+
+def fit_trends(matrix, years, degree=1, log=False):
+    """Fit a polynomial trend in year to every row of `matrix` at once.
+
+    Returns an (entity x degree + 1) array of coefficients, lowest power
+    first, in years centred on the middle of `years`. Rows with fewer
+    observations than coefficients get NaN.
+    """
+    years = np.asarray(years, dtype="float64")
+    center = (years[0] + years[-1]) / 2
+    values = matrix
+    if log:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.log(np.where(matrix > 0, matrix, np.nan))
+    present = ~np.isnan(values)
+    weights = present.astype("float64")
+    design = np.vander(years - center, degree + 1, increasing=True)
+    # X'WX and X'Wy of every entity, stacked along the first axis
+    normal = np.einsum("ey,yi,yj->eij", weights, design, design)
+    target = np.einsum("ey,yi->ei", np.where(present, values, 0.0), design)
+    solvable = present.sum(axis=1) > degree
+    normal[~solvable] = np.eye(degree + 1)
+    coefficients = np.linalg.solve(normal, target[..., None])[..., 0]
+    coefficients[~solvable] = np.nan
+    return coefficients
+
+
+class TrendFit:
+    """Fitted trends of one metric, with each entity's last observation to project from."""
+
+    def __init__(self, matrix, years, degree=1, log=False):
+        self.years = list(years)
+        self.log = log
+        self.center = (self.years[0] + self.years[-1]) / 2
+        self.coefficients = fit_trends(matrix, years, degree, log)
+        present = ~np.isnan(matrix)
+        last = np.where(present, np.arange(len(years)), -1).max(axis=1)
+        self.last_year = np.where(last >= 0, np.asarray(years)[np.maximum(last, 0)], np.nan)
+        self.last_value = np.where(last >= 0, matrix[np.arange(len(matrix)), np.maximum(last, 0)], np.nan)
+
+    def trend(self, rows, years):
+        """Return the fitted trend (on the fitted scale) of `rows` at `years`, as rows x years.
+
+        `years` is either shared by all rows or has one row of years per row.
+        """
+        years = np.asarray(years, dtype="float64") - self.center
+        powers = years[..., None] ** np.arange(self.coefficients.shape[1])
+        if years.ndim == 1:
+            return self.coefficients[rows] @ powers.T
+        return np.einsum("ei,eyi->ey", self.coefficients[rows], powers)
+
+
+class ProjectionEngine:
+    """Projections of MODELS metrics for one version of the data, with cached trend fits."""
+
+    def __init__(self, tables, degree=1):
+        self.tables = tables
+        self.degree = degree
+        self._fits = {}
+
+    def fit(self, metric):
+        """Return the TrendFit of `metric`, fitting all entities on first use."""
+        if metric not in self._fits:
+            log, _ = MODELS[metric]
+            self._fits[metric] = TrendFit(self.tables.matrix(metric), self.tables.years, self.degree, log)
+        return self._fits[metric]
+
+    def project(self, metric, entities, until=HORIZON, adjustment=0.0):
+        """Return the projection of `metric` for `entities` up to `until`.
+
+        One row per entity and projected year (Entity, Year, value), from the
+        year after the data ends. `adjustment` is the scenario on top of the
+        fitted trend: percentage points per year for linear metrics, percent
+        per year for log-linear ones.
+        """
+        fit = self.fit(metric)
+        log, (lower, upper) = MODELS[metric]
+        rows = self.tables.entities.get_indexer(entities)
+        rows = rows[rows >= 0]
+        future = np.arange(self.tables.years[-1] + 1, until + 1)
+        last_year = fit.last_year[rows][:, None]
+        last_value = fit.last_value[rows][:, None]
+        # Trend change since each entity's own last observation
+        change = fit.trend(rows, future) - fit.trend(rows, last_year)
+        steps = future - last_year
+        if log:
+            values = last_value * np.exp(change) * (1 + adjustment / 100) ** steps
+        else:
+            values = last_value + change + adjustment * steps
+        values = np.clip(values, lower, upper)
+        return pd.DataFrame({"Entity": np.repeat(self.tables.entities[rows], len(future)),
+                             "Year": np.tile(future, len(rows)),
+                             "value": values.ravel()})
+
+    def scenario(self, metric, entities, until=HORIZON, adjustment=0.0):
+        """Return the observed series of `metric` for `entities` followed by its projection.
+
+        One row per entity and year (Entity, Year, value, Series), Series being
+        "observed" or "projected". The projected line repeats each entity's
+        last observation so the two lines join up when plotted.
+        """
+        observed = self.tables.series(entities)[["Entity", "Year", metric]].rename(columns={metric: "value"})
+        observed = observed.dropna(subset=["value"])
+        fit = self.fit(metric)
+        rows = self.tables.entities.get_indexer(entities)
+        rows = rows[rows >= 0]
+        anchors = pd.DataFrame({"Entity": self.tables.entities[rows], "Year": fit.last_year[rows],
+                                "value": fit.last_value[rows]}).dropna()
+        projected = pd.concat([anchors, self.project(metric, entities, until, adjustment)])
+        return pd.concat([observed.assign(Series="observed"), projected.assign(Series="projected")],
+                         ignore_index=True)
@@ -0,0 +1,216 @@
+"""Missing-value imputation and outlier detection over the whole dataset.
+
+The stage runs once per dataset version, right after loading:
+
+1. Derived fills: a missing value is computed from the other columns of the
+   same row where a formula exists (Population = Density x Land Area, and
+   the inverses; low-carbon share from the electricity columns).
+2. Gap interpolation: the remaining gaps inside an entity's series are
+   filled linearly in Year. Leading and trailing gaps stay missing.
+3. Robust z-scores per metric and year: 0.6745 (x - median) / MAD, with
+   the mean absolute deviation standing in when the MAD is zero.
+   |z| > OUTLIER_THRESHOLD flags an outlier (Iglewicz and Hoaglin). CO2
+   and GDP per capita span orders of magnitude across countries and are
+   scored on log10, otherwise every large economy would be flagged.
+
+Everything is whole-column NumPy or grouped pandas reductions: rows are
+sorted by entity and year once, and previous/next valid values come from
+running maxima of positions instead of per-entity loops.
+
+The output is cached next to the columnar data as
+.energy_cache/<stem>.<version>.quality.parquet, holding the filled data
+plus one "<metric> robust z" column per OUTLIER_METRICS entry.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import energy_data
+
+CO2 = "Value_co2_emissions_kt_by_country"
+RENEWABLE_SHARE = "Renewable energy share in the total final energy consumption (%)"
+LOW_CARBON = "Low-carbon electricity (% electricity)"
+FOSSIL = "Electricity from fossil fuels (TWh)"
+NUCLEAR = "Electricity from nuclear (TWh)"
+RENEWABLES = "Electricity from renewables (TWh)"
+
+OUTLIER_METRICS = [CO2, RENEWABLE_SHARE, "gdp_per_capita"]
+OUTLIER_THRESHOLD = 3.5
+LOG_SCALED_METRICS = [CO2, "gdp_per_capita"]
+# Metrics interpolated within each entity; coordinates never change over time
+INTERPOLATED_METRICS = [c for c in energy_data.METRIC_COLUMNS if c not in ("Latitude", "Longitude")]
+
+
+def zscore_column(metric):
+    """Return the name of the robust z-score column of `metric`."""
+    return f"{metric} robust z"
+
+
+def derived_fills(data):
+    """Fill missing values that a formula gives from the same row; return the filled counts.
+
+    `data` is modified in place.
+    """
+    columns = {c: data[c].to_numpy(dtype="float64") for c in
+               ("Population", "Density", "Land Area(Km2)", LOW_CARBON, FOSSIL, NUCLEAR, RENEWABLES) if c in data}
+    formulas = []
+    if {"Population", "Density", "Land Area(Km2)"} <= columns.keys():
+        population, density, area = columns["Population"], columns["Density"], columns["Land Area(Km2)"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            formulas += [("Population", density * area),
+                         ("Density", population / area),
+                         ("Land Area(Km2)", population / density)]
+    if {LOW_CARBON, FOSSIL, NUCLEAR, RENEWABLES} <= columns.keys():
+        low_carbon = columns[NUCLEAR] + columns[RENEWABLES]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            formulas.append((LOW_CARBON, 100 * low_carbon / (low_carbon + columns[FOSSIL])))
+    filled = {}
+    for column, derived in formulas:
+        values = columns[column]
+        fill = np.isnan(values) & np.isfinite(derived)
+        if fill.any():
+            values[fill] = derived[fill]
+            data[column] = values.astype(data[column].dtype)
+        filled[column] = int(fill.sum())
+    return filled
+
+
+def _interpolate(values, years, entities):
+    """Linearly fill the interior gaps of `values`, sorted by entity then year, in place."""
+    n = len(values)
+    valid = ~np.isnan(values)
+    positions = np.arange(n)
+    # Position of the previous and next valid value, whatever entity it is in
+    previous = np.maximum.accumulate(np.where(valid, positions, -1))
+    following = np.minimum.accumulate(np.where(valid, positions, n)[::-1])[::-1]
+    gaps = np.flatnonzero(~valid & (previous >= 0) & (following < n))
+    before, after = previous[gaps], following[gaps]
+    # Rows are sorted by entity, so a gap is inside its entity's series
+    # exactly when both neighbours belong to the same entity
+    inside = entities[before] == entities[after]
+    gaps, before, after = gaps[inside], before[inside], after[inside]
+    weight = (years[gaps] - years[before]) / (years[after] - years[before])
+    values[gaps] = values[before] + weight * (values[after] - values[before])
+    return len(gaps)
+
+
+def interpolate_gaps(data, columns=None):
+    """Fill gaps inside each entity's series by linear interpolation in Year; return the filled counts.
+
+    `data` is modified in place; its row order is kept.
+    """
+    columns = [c for c in (INTERPOLATED_METRICS if columns is None else columns) if c in data]
+    entities = pd.factorize(data["Entity"])[0].astype("int64")
+    years = data["Year"].to_numpy(dtype="int64")
+    # One combined key sorts like (entity, year); a stable sort is fast on
+    # files that are already grouped by entity, where lexsort is not
+    span = int(years.max() - years.min()) + 1 if len(years) else 1
+    order = np.argsort(entities * span + (years - years.min(initial=0)), kind="stable")
+    years = years.astype("float64")
+    sorted_entities, sorted_years = entities[order], years[order]
+    filled = {}
+    for column in columns:
+        values = data[column].to_numpy(dtype="float64")
+        if not np.isnan(values).any():
+            filled[column] = 0
+            continue
+        sorted_values = values[order]
+        filled[column] = _interpolate(sorted_values, sorted_years, sorted_entities)
+        values[order] = sorted_values
+        data[column] = values.astype(data[column].dtype)
+    return filled
+
+
+def robust_zscores(data, columns=None):
+    """Return the robust z-score of every value against its metric and year, as a frame.
+
+    LOG_SCALED_METRICS are scored on log10; their zero or negative values get no score.
+    """
+    columns = [c for c in (OUTLIER_METRICS if columns is None else columns) if c in data]
+    years = data["Year"].to_numpy()
+    values = data[columns].astype("float64")
+    for column in set(columns) & set(LOG_SCALED_METRICS):
+        values[column] = np.log10(values[column].where(values[column] > 0))
+    median = values.groupby(years, sort=False).transform("median")
+    deviation = (values - median).abs()
+    by_year = deviation.groupby(years, sort=False)
+    mad = by_year.transform("median")
+    # MAD is zero when over half the year shares one value; fall back to the
+    # mean absolute deviation, scaled to match a normal distribution
+    spread = (mad / 0.6745).where(mad > 0, by_year.transform("mean") * 1.2533)
+    z = ((values - median) / spread).where(spread > 0)
+    return z.astype("float32").rename(columns=zscore_column)
+
+
+def outliers(data, columns=None, threshold=OUTLIER_THRESHOLD):
+    """Return a boolean frame flagging the values of `columns` with |robust z| above `threshold`."""
+    columns = [c for c in (OUTLIER_METRICS if columns is None else columns) if zscore_column(c) in data]
+    return pd.DataFrame({c: data[zscore_column(c)].abs() > threshold for c in columns}, index=data.index)
+
+
+def flagged_rows(data, columns=None, threshold=OUTLIER_THRESHOLD):
+    """Return the flagged values of `columns` as rows of Entity, Year, metric, value and robust z."""
+    flags = outliers(data, columns, threshold)
+    frames = [pd.DataFrame({"Entity": data.loc[flags[c], "Entity"], "Year": data.loc[flags[c], "Year"],
+                            "metric": c, "value": data.loc[flags[c], c],
+                            "robust z": data.loc[flags[c], zscore_column(c)]})
+              for c in flags.columns]
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["Entity", "Year", "metric", "value", "robust z"])
+    return rows.sort_values("robust z", key=abs, ascending=False, ignore_index=True)
+
+
+def quality_summary(raw, checked):
+    """Return missing values per column before and after the stage, and the outliers flagged."""
+    flags = outliers(checked)
+    summary = pd.DataFrame({"missing in source": raw.isna().sum(),
+                            "missing after fills": checked[raw.columns].isna().sum()})
+    summary["filled"] = summary["missing in source"] - summary["missing after fills"]
+    summary["outliers"] = flags.sum().reindex(summary.index)
+    return summary
+
+
+def quality_stage(data):
+    """Run derived fills, interpolation and z-scores on a copy of `data`.
+
+    Returns (filled data with z-score columns, {column: values filled}).
+    """
+    data = data.copy()
+    filled = derived_fills(data)
+    for column, count in interpolate_gaps(data).items():
+        filled[column] = filled.get(column, 0) + count
+    return pd.concat([data, robust_zscores(data)], axis=1), filled
+
+
+def quality_cache_path(path=energy_data.DATA_PATH, version=None):
+    """Return the cached quality stage output for `path` at `version`."""
+    return energy_data.columnar_cache_path(path, version).replace(".parquet", ".quality.parquet")
+
+
+def read_quality_data(path=energy_data.DATA_PATH, columns=None, version=None):
+    """Read the data after the quality stage, optionally restricted to `columns`.
+
+    `columns` may include z-score columns (see `zscore_column`); by default
+    only the data columns are returned. The stage runs on first use of a
+    version and its output is cached like the columnar data, falling back
+    to running it in memory when pyarrow is missing or the cache directory
+    is not writable.
+    """
+    version = version or energy_data.dataset_version(path)
+    data_columns = list(energy_data.SCHEMA)
+    columns = list(columns) if columns is not None else data_columns
+    if energy_data.pyarrow is not None:
+        cache_path = quality_cache_path(path, version)
+        try:
+            if not os.path.exists(cache_path):
+                # Same write-then-rename as the columnar cache
+                checked, _ = quality_stage(energy_data.read_energy_data(path, version=version))
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                checked.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, cache_path)
+            return pd.read_parquet(cache_path, columns=columns, memory_map=True)
+        except OSError:
+            pass
+    checked, _ = quality_stage(energy_data.read_energy_data(path, version=version))
+    return checked[columns]
@@ -0,0 +1,189 @@
+"""Background refresh of the dataset.
+
+The app keeps one DatasetRefresher per process. It holds the current
+Dataset (the loaded frame plus the indexes derived from it) and a daemon
+thread that polls the source for a new file. A new version is loaded,
+validated and warmed on that thread, then swapped in with one assignment.
+
+A rerun reads `current()` once at the top and uses that Dataset throughout,
+so a session in the middle of a rerun finishes on the old version and picks
+up the new one on its next rerun. No session ever waits on a load.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+
+import energy_correlations
+import energy_data
+import energy_precompute
+import energy_quality
+import energy_tables
+
+logger = logging.getLogger("sustainable_energy")
+
+# Seconds between two polls of the source
+POLL_INTERVAL = 10.0
+
+
+class Dataset:
+    """One loaded and validated version of the data and everything derived from it.
+
+    Anything else derived from this version (projected tables, reports) is
+    kept with `memo`, so it goes away together with the version.
+    """
+
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version or energy_data.dataset_version(path)
+        # Validate the file as read, before the quality stage runs on it
+        energy_data.validate_energy_data(energy_data.read_energy_data(path, version=self.version))
+        self.data = energy_quality.read_quality_data(path, version=self.version)
+        self.tables = energy_tables.EnergyTables(self.data)
+        self.correlations = energy_correlations.CorrelationService(self.tables)
+        self.artifacts = energy_precompute.read_artifacts(path, self.version)
+        self.loaded = time.time()
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def memo(self, key, build):
+        """Return the value kept under `key` for this version, calling `build()` the first time."""
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        # Build outside the lock, like FigureCache: a slow build doesn't block other keys
+        value = build()
+        with self._lock:
+            return self._memo.setdefault(key, value)
+
+
+class DatasetRefresher:
+    """Keep the newest version of the dataset loaded, refreshing it on a background thread.
+
+    The source is `path`, or with `source_dir` the newest file matching
+    `pattern` in that directory. A changed file is only loaded once it has
+    looked the same on two polls in a row, so a file still being written is
+    usually not picked up half-way; `refresh()` skips that wait. Writers
+    that can should publish new files by renaming them into `source_dir`,
+    which makes that wait unnecessary. `warm(dataset)` is
+    called on the new Dataset before it is swapped in, to build whatever the
+    views need on the background thread rather than on a rerun.
+    """
+
+    def __init__(self, path=energy_data.DATA_PATH, source_dir=None, pattern="*.csv",
+                 interval=POLL_INTERVAL, warm=None):
+        self.path = path
+        self.source_dir = source_dir
+        self.pattern = pattern
+        self.interval = interval
+        self.warm = warm
+        self.loading = None       # version being loaded, if any
+        self.last_error = None    # why the last new file was rejected
+        self._current = None
+        self._signature = None    # (path, mtime_ns, size) of the file behind _current
+        self._pending = None      # signature seen on the previous poll
+        self._wake = threading.Event()
+        self._thread = None
+
+    def source(self):
+        """Return the file the dataset is loaded from."""
+        if self.source_dir is None:
+            return self.path
+        candidates = glob.glob(os.path.join(self.source_dir, self.pattern))
+        if not candidates:
+            raise FileNotFoundError(f"no {self.pattern} file in {self.source_dir}")
+        return max(candidates, key=os.path.getmtime)
+
+    def _signature_of(self, path):
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, path, version=None):
+        dataset = Dataset(path, version)
+        if self.warm is not None:
+            self.warm(dataset)
+        return dataset
+
+    def start(self):
+        """Load the current source, then start the polling thread; return self.
+
+        The first load happens on the calling thread since there is no older
+        version to serve meanwhile.
+        """
+        path = self.source()
+        signature = self._signature_of(path)
+        self._current = self._load(path)
+        self._signature = self._pending = signature
+        # Caches of versions from earlier runs
+        energy_data.remove_columnar_cache(path, keep=self._current.version)
+        self._thread = threading.Thread(target=self._run, name="energy-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def current(self):
+        """Return the Dataset to serve; read it once per rerun."""
+        return self._current
+
+    def refresh(self):
+        """Ask the polling thread to check the source now, without waiting for the file to settle."""
+        self._wake.set()
+
+    def check(self, force=False):
+        """Swap in the source's new version if there is one; return True when a swap happened."""
+        path = self.source()
+        signature = self._signature_of(path)
+        if signature == self._signature:
+            return False
+        if not force and signature != self._pending:
+            self._pending = signature
+            return False
+        version = energy_data.dataset_version(path)
+        current = self._current
+        if path == current.path and version.split("-", 1)[1] == current.version.split("-", 1)[1]:
+            # Touched but the content hash is the same
+            self._signature = signature
+            return False
+        self.loading = version
+        try:
+            dataset = self._load(path, version)
+        except (OSError, ValueError, KeyError) as error:
+            # Keep serving the current version; don't retry this file until it changes
+            self.last_error = f"{os.path.basename(path)} ({version}): {error}"
+            self._signature = signature
+            # Whatever the rejected version got cached as; the served version's caches stay
+            energy_data.remove_columnar_cache(path, version)
+            logger.warning("dataset refresh rejected %s", self.last_error)
+            return False
+        except Exception:
+            # Unexpected (a bug in `warm`, MemoryError, ...): _run reports it;
+            # like a rejected file, this file is not retried until it changes
+            self._signature = signature
+            energy_data.remove_columnar_cache(path, version)
+            raise
+        finally:
+            self.loading = None
+        self._current = dataset
+        self._signature = signature
+        self.last_error = None
+        # Only once the new version is served. A rerun still on the old
+        # version that needs one of these gets a ValueError from
+        # convert_to_columnar, never the new file's rows under the old version
+        energy_data.remove_columnar_cache(current.path, current.version)
+        logger.info("dataset refreshed to version %s from %s", version, path)
+        return True
+
+    def _run(self):
+        while True:
+            forced = self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.check(force=forced)
+                current = self._current
+                if current.artifacts is None:
+                    # Precomputed tables may be written after the version was loaded
+                    current.artifacts = energy_precompute.read_artifacts(current.path, current.version)
+            except Exception as error:
+                # Whatever went wrong, keep serving the current version and keep polling
+                self.last_error = f"{type(error).__name__}: {error}"
+                logger.exception("dataset refresh failed")
@@ -0,0 +1,155 @@
+"""Server-side table serving: summary statistics, sorting, pages and column projection.
+
+st.dataframe ships every row and column it is given to the browser, and
+describe() rescans the whole frame on each call. Tables are served through
+a TableServer instead, which sorts on the server (each sort order computed
+once), then sends only the requested page of the requested columns. Summary
+statistics are computed once per dataset version with `summary_statistics`:
+exactly with describe() up to EXACT_SUMMARY_ROWS rows, and in one streaming
+pass over chunks above that, where quantiles come from a mergeable sketch
+with a rank error of about 1/SKETCH_POINTS.
+"""
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 10
+EXACT_SUMMARY_ROWS = 1_000_000
+CHUNK_ROWS = 250_000
+# Quantile points kept per chunk and column by StreamingSummary
+SKETCH_POINTS = 1024
+SUMMARY_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+class StreamingSummary:
+    """describe()-style statistics of numeric `columns`, updated one chunk of rows at a time.
+
+    Count, mean and variance are merged exactly (Chan et al.); min and max
+    are running. For quantiles each chunk is reduced to SKETCH_POINTS evenly
+    spaced order statistics per column, weighted by the chunk's count, and
+    the quantiles are read off the merged weighted points. Once more than
+    `max_sketches` chunk sketches are held they are compressed into one.
+    """
+
+    def __init__(self, columns, points=SKETCH_POINTS, max_sketches=64):
+        k = len(columns)
+        self.columns = list(columns)
+        self.points = points
+        self.max_sketches = max_sketches
+        self.count = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self._sketches = []  # (points x k values, k weights per point)
+
+    def update(self, chunk):
+        """Add the rows of `chunk` and return self."""
+        values = np.sort(chunk[self.columns].to_numpy(dtype="float64"), axis=0)  # NaN sorts last
+        count = (~np.isnan(values)).sum(axis=0).astype("float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(values, axis=0) / count
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+        present = count > 0
+        total = self.count + count
+        delta = np.where(present, mean - self.mean, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(present, self.mean + delta * count / total, self.mean)
+            self.m2 = np.where(present, self.m2 + np.nan_to_num(m2) + delta ** 2 * self.count * count / total, self.m2)
+        self.count = total
+        if len(values):
+            # Sorted, so the first present value is the min and the last present value the max
+            last = np.maximum(count.astype("int64") - 1, 0)
+            self.min = np.where(present, np.fmin(self.min, values[0]), self.min)
+            self.max = np.where(present, np.fmax(self.max, values[last, np.arange(len(self.columns))]), self.max)
+            positions = np.linspace(0, 1, self.points)[:, None] * (np.maximum(count, 1) - 1)
+            sketch = np.take_along_axis(values, positions.round().astype("int64"), axis=0)
+            self._sketches.append((sketch, count / self.points))
+            if len(self._sketches) > self.max_sketches:
+                self._compress()
+        return self
+
+    def _merged(self, column):
+        values = np.concatenate([sketch[:, column] for sketch, _ in self._sketches])
+        weights = np.concatenate([np.full(len(sketch), w[column]) for sketch, w in self._sketches])
+        keep = ~np.isnan(values) & (weights > 0)
+        order = np.argsort(values[keep], kind="stable")
+        return values[keep][order], weights[keep][order]
+
+    def _quantile(self, column, q):
+        values, weights = self._merged(column)
+        if not len(values):
+            return np.full(len(q), np.nan)
+        # Position of each point at the middle of its weight, like the midpoint rule
+        cumulative = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return np.interp(q, cumulative, values)
+
+    def _compress(self):
+        q = np.linspace(0, 1, self.points)
+        sketch = np.column_stack([self._quantile(j, q) for j in range(len(self.columns))])
+        self._sketches = [(sketch, self.count / self.points)]
+
+    def describe(self):
+        """Return the statistics as a frame shaped like DataFrame.describe()."""
+        q = np.array([0.25, 0.5, 0.75])
+        quantiles = np.column_stack([self._quantile(j, q) for j in range(len(self.columns))]) \
+            if self._sketches else np.full((3, len(self.columns)), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        empty = self.count == 0
+        rows = [self.count, np.where(empty, np.nan, self.mean), std,
+                np.where(empty, np.nan, self.min), *quantiles, np.where(empty, np.nan, self.max)]
+        return pd.DataFrame(rows, index=SUMMARY_INDEX, columns=self.columns)
+
+
+def summary_statistics(data, exact_rows=EXACT_SUMMARY_ROWS, chunk_rows=CHUNK_ROWS):
+    """Return describe() of the numeric columns of `data`, streamed over chunks above `exact_rows` rows."""
+    columns = data.select_dtypes("number").columns
+    if len(data) <= exact_rows:
+        return data[columns].describe()
+    summary = StreamingSummary(columns)
+    for start in range(0, len(data), chunk_rows):
+        summary.update(data.iloc[start:start + chunk_rows])
+    return summary.describe()
+
+
+class TableServer:
+    """Serves one frame a page at a time: sorted, projected and sliced on the server."""
+
+    def __init__(self, data):
+        self.data = data
+        self.columns = list(data.columns)
+        self._orders = {}   # (column, ascending) -> row positions
+        self._summary = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def pages(self, size=PAGE_SIZE):
+        """Return the number of pages of `size` rows (at least 1)."""
+        return max(1, -(-len(self.data) // size))
+
+    def order(self, column, ascending=True):
+        """Return the row positions sorted by `column`, missing values last; computed once per direction."""
+        key = (column, ascending)
+        if key not in self._orders:
+            values = self.data[column].reset_index(drop=True)
+            self._orders[key] = values.sort_values(ascending=ascending, kind="stable",
+                                                   na_position="last").index.to_numpy()
+        return self._orders[key]
+
+    def page(self, number, size=PAGE_SIZE, sort_by=None, ascending=True, columns=None):
+        """Return page `number` (from 0) of `size` rows, sorted by `sort_by`, with only `columns`."""
+        start = number * size
+        if sort_by is None:
+            rows = self.data.iloc[start:start + size]
+        else:
+            rows = self.data.iloc[self.order(sort_by, ascending)[start:start + size]]
+        return rows if columns is None else rows[list(columns)]
+
+    def summary(self, columns=None):
+        """Return the summary statistics of the numeric `columns` (all by default), computed once."""
+        if self._summary is None:
+            self._summary = summary_statistics(self.data)
+        if columns is None:
+            return self._summary
+        return self._summary[[c for c in columns if c in self._summary.columns]]
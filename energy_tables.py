@@ -0,0 +1,121 @@
+"""Derived tables for the Analysis views.
+
+The views used to filter the whole frame by year and sort it again on every
+rerun. EnergyTables does that work once per dataset version: the app builds
+one instance per version and every view reads from it.
+"""
+import numpy as np
+import pandas as pd
+
+# Metrics ranked for every year up front; other metrics are ranked on demand
+RANKED_METRICS = ["gdp_per_capita", "Access to electricity (% of population)"]
+
+
+class EnergyTables:
+    """Year and entity indexes, rankings, latest rows and changes over time for one version of the data."""
+
+    def __init__(self, data):
+        self.data = data
+        # Rows grouped by year, so each year is one contiguous slice
+        self.by_year = data.sort_values("Year", kind="stable", ignore_index=True)
+        years = self.by_year["Year"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+        stops = np.r_[starts[1:], len(years)]
+        self.year_slices = {int(years[start]): slice(start, stop) for start, stop in zip(starts, stops)}
+        self.years = sorted(self.year_slices)
+        # Latest row per entity, by year rather than by file order
+        self.latest = self.by_year.drop_duplicates("Entity", keep="last").reset_index(drop=True)
+        # Entity x Year grid shared by the metric matrices used for changes over time
+        self._entity_codes, entities = pd.factorize(self.by_year["Entity"], sort=True)
+        self.entities = pd.Index(np.asarray(entities), name="Entity")
+        self._year_codes = np.searchsorted(self.years, years)
+        # Rows sorted by entity then year, so each entity's series is one contiguous slice
+        order = np.lexsort((self._year_codes, self._entity_codes))
+        self.by_entity = self.by_year.take(order).reset_index(drop=True)
+        entity_codes = self._entity_codes[order]
+        starts = np.flatnonzero(np.r_[True, entity_codes[1:] != entity_codes[:-1]])
+        stops = np.r_[starts[1:], len(entity_codes)]
+        self.entity_slices = {self.entities[entity_codes[start]]: slice(start, stop)
+                              for start, stop in zip(starts, stops)}
+        self._matrices = {}
+        self._changes = {}
+        self._rankings = {}
+        for year in self.years:
+            for metric in RANKED_METRICS:
+                if metric in data:
+                    self.ranking(metric, year, ascending=True)
+                    self.ranking(metric, year, ascending=False)
+
+    def year(self, year):
+        """Return the rows for `year` (empty if the year is not in the data)."""
+        return self.by_year.iloc[self.year_slices.get(year, slice(0, 0))]
+
+    def series(self, entities, columns=None):
+        """Return the rows of `entities` (a name or a list of names), sorted by year.
+
+        Each entity is one slice lookup, so the cost depends on the length of
+        the returned series rather than on the size of the dataset.
+        """
+        if isinstance(entities, str):
+            entities = [entities]
+        slices = [self.entity_slices[entity] for entity in entities if entity in self.entity_slices]
+        positions = np.concatenate([np.arange(s.start, s.stop) for s in slices]) if slices else []
+        rows = self.by_entity.iloc[positions]
+        return rows if columns is None else rows[list(columns)]
+
+    def ranking(self, metric, year=None, ascending=True):
+        """Return one row per entity sorted by `metric`, NaNs last.
+
+        `year=None` ranks the latest row of each entity.
+        """
+        key = (metric, year, ascending)
+        if key not in self._rankings:
+            rows = self.latest if year is None else self.year(year)
+            self._rankings[key] = (rows.drop_duplicates("Entity")
+                                   .sort_values(metric, ascending=ascending, kind="stable")
+                                   .reset_index(drop=True))
+        return self._rankings[key]
+
+    def top(self, metric, n, year=None):
+        """Return the `n` entities with the highest `metric`."""
+        return self.ranking(metric, year, ascending=False).head(n)
+
+    def bottom(self, metric, n, year=None):
+        """Return the `n` entities with the lowest `metric`."""
+        return self.ranking(metric, year, ascending=True).head(n)
+
+    def matrix(self, metric):
+        """Return `metric` as an (entity x year) array, NaN where a row is missing.
+
+        Rows follow `self.entities` and columns follow `self.years`.
+        """
+        if metric not in self._matrices:
+            matrix = np.full((len(self.entities), len(self.years)), np.nan)
+            matrix[self._entity_codes, self._year_codes] = self.by_year[metric].to_numpy(dtype="float64")
+            self._matrices[metric] = matrix
+        return self._matrices[metric]
+
+    def change(self, metric, start, end):
+        """Return the change of `metric` between the years `start` and `end`.
+
+        One row per entity with the start and end values, the difference
+        (end - start), the percentage change and the compound annual growth
+        rate. Entities without a value in either year get NaN rather than a
+        neighbouring year's value.
+        """
+        key = (metric, start, end)
+        if key not in self._changes:
+            matrix = self.matrix(metric)
+            empty = np.full(len(self.entities), np.nan)
+            first = matrix[:, self.years.index(start)] if start in self.year_slices else empty
+            last = matrix[:, self.years.index(end)] if end in self.year_slices else empty
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pct_change = np.where(first != 0, (last - first) / np.abs(first) * 100, np.nan)
+                cagr = empty
+                if end > start:
+                    growth = np.where((first > 0) & (last >= 0), last / first, np.nan)
+                    cagr = (growth ** (1 / (end - start)) - 1) * 100
+            self._changes[key] = pd.DataFrame({"start": first, "end": last, "difference": last - first,
+                                               "pct_change": pct_change, "cagr": cagr},
+                                              index=self.entities)
+        return self._changes[key]
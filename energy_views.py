@@ -0,0 +1,82 @@
+"""Data behind each Analysis view, as plain functions.
+
+Each function takes the per-version EnergyTables (and CorrelationService
+where needed) plus the view's parameters, and returns the frame the view
+displays or plots. The Streamlit script only adds widgets and figures on
+top, which lets the benchmark script time every view without a browser.
+"""
+ACCESS = "Access to electricity (% of population)"
+RENEWABLE_SHARE = "Renewable energy share in the total final energy consumption (%)"
+CO2 = "Value_co2_emissions_kt_by_country"
+LOW_CARBON = "Low-carbon electricity (% electricity)"
+
+GDP_COLUMNS = ["Year", "Entity", "gdp_per_capita"]
+ACCESS_COLUMNS = ["Entity", "Year", ACCESS, "gdp_per_capita", "Land Area(Km2)", "Population"]
+ACCESS_CORRELATION_COLUMNS = [ACCESS, "gdp_per_capita", "Land Area(Km2)", "Population"]
+GEO_CORRELATION_COLUMNS = ["Latitude", "Longitude", "Land Area(Km2)", "Density", ACCESS, RENEWABLE_SHARE, CO2]
+TREND_COLUMNS = [ACCESS, RENEWABLE_SHARE]
+LOW_CARBON_COLUMNS = ["Entity", "Year", LOW_CARBON, "gdp_per_capita"]
+
+
+def gdp_rankings(tables, year, n=10):
+    """Return the `n` highest and `n` lowest GDP per capita entities in `year`."""
+    return (tables.top("gdp_per_capita", n, year)[GDP_COLUMNS],
+            tables.bottom("gdp_per_capita", n, year)[GDP_COLUMNS])
+
+
+def gdp_history(tables, year, n=3, highest=True):
+    """Return the GDP per capita series of the `n` highest (or lowest) entities in `year`."""
+    ranked = tables.top("gdp_per_capita", n, year) if highest else tables.bottom("gdp_per_capita", n, year)
+    return tables.series(ranked["Entity"].tolist(), GDP_COLUMNS)
+
+
+def access_rankings(tables, year, lowest_n=10, highest_n=20):
+    """Return the entities with the lowest and highest access to electricity in `year`."""
+    return (tables.bottom(ACCESS, lowest_n, year)[ACCESS_COLUMNS],
+            tables.top(ACCESS, highest_n, year)[ACCESS_COLUMNS])
+
+
+def access_correlations(correlations, year=None, entities=None):
+    """Return the access/GDP/area/population correlation matrix."""
+    return correlations.corr(ACCESS_CORRELATION_COLUMNS, year=year, entities=entities)
+
+
+def geo_correlations(correlations):
+    """Return the correlation matrix of the geographic and energy columns."""
+    return correlations.corr(GEO_CORRELATION_COLUMNS)
+
+
+def geo_top_emitters(tables, n=10):
+    """Return the `n` largest CO2 emitters, from each entity's latest row."""
+    return tables.top(CO2, n)
+
+
+def geo_top_gdp(tables, n=10):
+    """Return the `n` highest GDP per capita entities, from each entity's latest row."""
+    return tables.top("gdp_per_capita", n)
+
+
+def geo_points(tables):
+    """Return the latest row of every entity, for the all-entities maps."""
+    return tables.latest
+
+
+def low_carbon_ranking(tables, n=10):
+    """Return the `n` entities with the highest low-carbon electricity share."""
+    return tables.top(LOW_CARBON, n)[LOW_CARBON_COLUMNS]
+
+
+def emissions_reduction(tables, start, end):
+    """Return the entities whose CO2 emissions fell between `start` and `end`.
+
+    `emission_difference` is the reduction (start - end), largest first.
+    """
+    change = tables.change(CO2, start, end)
+    reduced = change[change["difference"] < 0]
+    return (reduced.assign(emission_difference=-reduced["difference"])
+            .sort_values("emission_difference", ascending=False))
+
+
+def entity_trends(tables, entities):
+    """Return the access and renewable share series of `entities`."""
+    return tables.series(entities, ["Entity", "Year", *TREND_COLUMNS])